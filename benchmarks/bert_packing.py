@@ -0,0 +1,91 @@
+"""
+Compares the entities found by BERT with and without packing several sentences into a single row of BERT input, see
+:class:`InputDataPackedRow <data_suppliers.text.nerbio.data_classes.InputDataPackedRow>`, and the time both take.
+
+.. code-block:: bash
+
+    python benchmarks/bert_packing.py --configfile server/config_NA.json --textfile tests/test_data/ocrtext.txt
+"""
+import argparse
+import copy
+import json
+import os.path as op
+import time
+from typing import Dict, List
+
+from lib.pipeline import Pipeline
+from lib.ner_bert.ner_bert import MultipleBerts
+
+TEST_DATA_DIR = op.join(op.dirname(__file__), '..', 'tests', 'test_data')
+
+
+def get_entities(sentences: List[List[Dict]]):
+    """
+    :param sentences: Sentences that have been processed by BERT
+    :return: A set of (begin_char, end_char, entity type) tuples, one for each entity.
+    """
+    return set(
+        (word['entity_chars'][0][0], word['entity_chars'][-1][1], word['bio'][2:])
+        for sentence in sentences for word in sentence
+        if word['ner'] and word['bio'].startswith('B')
+    )
+
+
+def timed_call(ner_bert: MultipleBerts, sentences: List[List[Dict]]):
+    """
+    :return: The result of the call to ner_bert and the time it took in seconds
+    """
+    start = time.perf_counter()
+    result = ner_bert(sentences)
+    return result, time.perf_counter() - start
+
+
+def compare(berts_to_use: Dict[str, List[str]], sentences: List[List[Dict]]):
+    """
+    :param berts_to_use: See :class:`MultipleBerts <lib.ner_bert.ner_bert.MultipleBerts>`
+    :param sentences: Post-corrected sentences
+    :return: A dictionary with the timings and the agreement between packed and unpacked mode
+    """
+    unpacked, unpacked_time = timed_call(MultipleBerts(berts_to_use, pack_sentences=False), copy.deepcopy(sentences))
+    packed, packed_time = timed_call(MultipleBerts(berts_to_use, pack_sentences=True), copy.deepcopy(sentences))
+
+    unpacked_bio = [word['bio'] for sentence in unpacked for word in sentence if word['ner']]
+    packed_bio = [word['bio'] for sentence in packed for word in sentence if word['ner']]
+    unpacked_entities = get_entities(unpacked)
+    packed_entities = get_entities(packed)
+    return {
+        'unpacked_time': unpacked_time,
+        'packed_time': packed_time,
+        'nr_words': len(unpacked_bio),
+        'word_agreement': sum(u == p for u, p in zip(unpacked_bio, packed_bio)) / max(len(unpacked_bio), 1),
+        'nr_unpacked_entities': len(unpacked_entities),
+        'nr_packed_entities': len(packed_entities),
+        'nr_common_entities': len(unpacked_entities & packed_entities),
+        'only_unpacked': sorted(unpacked_entities - packed_entities),
+        'only_packed': sorted(packed_entities - unpacked_entities),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--configfile', type=str, default=op.join(TEST_DATA_DIR, 'server', 'config_test.json'))
+    parser.add_argument('--textfile', type=str, default=op.join(TEST_DATA_DIR, 'AN_disk1_ZIPs_7538_alto.txt'))
+    parser.add_argument('--show_differences', action='store_true', help='Print the entities found in only one mode')
+    args = parser.parse_args()
+    with open(args.configfile) as f:
+        config = json.load(f)
+    with open(args.textfile) as f:
+        text = f.read()
+
+    pipeline = Pipeline({k: v for k, v in config.items() if k in ('string_to_sentences', 'post_correction')})
+    corrected = pipeline(text)
+    comparison = compare(config['ner_bert']['berts_to_use'], corrected)
+    print(f"unpacked: {comparison['unpacked_time']:.2f} s, packed: {comparison['packed_time']:.2f} s")
+    print(f"word-level agreement on {comparison['nr_words']} words: {100 * comparison['word_agreement']:.2f}%")
+    print(f"entities unpacked: {comparison['nr_unpacked_entities']}, packed: {comparison['nr_packed_entities']}, "
+          f"common: {comparison['nr_common_entities']}")
+    if args.show_differences:
+        for begin, end, entity_type in comparison['only_unpacked']:
+            print(f'only unpacked: {entity_type} {text[begin:end]!r}')
+        for begin, end, entity_type in comparison['only_packed']:
+            print(f'only packed: {entity_type} {text[begin:end]!r}')
@@ -0,0 +1,98 @@
+"""
+Compares a Keras BERT with its quantized TFLite export, see
+:func:`export_tflite <models.nlp.bert_home_trained.model_tflite.export_tflite>`: the agreement of the predicted labels
+and the CPU latency and throughput of both.
+
+The TFLite model is not part of :data:`BERTS <lib.ner_bert.ner_bert.BERTS>`. Export it next to the weights of the
+Keras model, check the agreement with this benchmark, and only then add an entry with the .tflite weights_path to BERTS.
+
+.. code-block:: bash
+
+    python models/nlp/bert_home_trained/model_tflite.py pipeline_data/ner_bert/<model>/<weights>.h5
+    python benchmarks/bert_tflite.py --bert 40-10-1-split-minus-137-fixed --textfile tests/test_data/ocrtext.txt
+"""
+import argparse
+import json
+import os.path as op
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from lib.pipeline import Pipeline
+from lib.ner_bert.inference import Bert
+from lib.ner_bert.ner_bert import BERTS
+from data_suppliers.text.nerbio.data_classes import InputData
+
+TEST_DATA_DIR = op.join(op.dirname(__file__), '..', 'tests', 'test_data')
+
+
+def timed_predictions(bert, input_data: InputData, repeats: int):
+    """
+    :return: The predictions of the bert and the time of the fastest of the repeated calls in seconds
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = bert(input_data.get_x())
+        timings.append(time.perf_counter() - start)
+    return np.asarray(result), min(timings)
+
+
+def compare(bert_name: str, tflite_path: str, sentences: List[List[Dict]], repeats: int = 3):
+    """
+    :param bert_name: Name in :data:`BERTS <lib.ner_bert.ner_bert.BERTS>` of the Keras model
+    :param tflite_path: Path of the .tflite file exported from the Keras model
+    :param sentences: Post-corrected sentences
+    :param repeats: Number of times each model is run, the fastest run is reported
+    :return: A dictionary with the timings and the agreement between both models
+    """
+    bert = Bert.create_bert(BERTS[bert_name]['vocab'], BERTS[bert_name]['weights_path'])
+    tflite_bert = Bert.create_bert(BERTS[bert_name]['vocab'], tflite_path)
+    word_form = BERTS[bert_name]['word_form']
+    input_data = InputData.from_sentences(
+        [[word[word_form] for word in sentence if word['ner']] for sentence in sentences],
+        bert.tokenizer, bert.max_length, BERTS[bert_name]['vocab'])
+
+    result, bert_time = timed_predictions(bert, input_data, repeats)
+    tflite_result, tflite_time = timed_predictions(tflite_bert, input_data, repeats)
+
+    tokens = input_data.masks.astype(bool)
+    words = tokens & input_data.is_heads.astype(bool)
+    labels = result.argmax(axis=-1)
+    tflite_labels = tflite_result.argmax(axis=-1)
+    return {
+        'nr_rows': input_data.size,
+        'bert_time': bert_time,
+        'tflite_time': tflite_time,
+        'nr_words': int(words.sum()),
+        'token_agreement': (labels == tflite_labels)[tokens].mean(),
+        'word_agreement': (labels == tflite_labels)[words].mean(),
+        'max_abs_difference': np.abs(result - tflite_result)[tokens].max(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bert', type=str, default='40-10-1-split-minus-137-fixed')
+    parser.add_argument('--tflite_path', type=str, default=None,
+                        help='By default the weights_path of the Keras model with the extension .tflite')
+    parser.add_argument('--configfile', type=str, default=op.join(TEST_DATA_DIR, 'server', 'config_test.json'))
+    parser.add_argument('--textfile', type=str, default=op.join(TEST_DATA_DIR, 'AN_disk1_ZIPs_7538_alto.txt'))
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    with open(args.configfile) as f:
+        config = json.load(f)
+    with open(args.textfile) as f:
+        text = f.read()
+
+    pipeline = Pipeline({k: v for k, v in config.items() if k in ('string_to_sentences', 'post_correction')})
+    tflite_path = args.tflite_path or op.splitext(BERTS[args.bert]['weights_path'])[0] + '.tflite'
+    comparison = compare(args.bert, tflite_path, pipeline(text), args.repeats)
+    nr_rows = comparison['nr_rows']
+    for name in ('bert', 'tflite'):
+        print(f"{name}: {comparison[name + '_time']:.2f} s for {nr_rows} rows, "
+              f"{nr_rows / comparison[name + '_time']:.1f} rows/s")
+    print(f"label agreement on tokens: {100 * comparison['token_agreement']:.2f}%, "
+          f"on {comparison['nr_words']} words: {100 * comparison['word_agreement']:.2f}%")
+    print(f"maximum absolute difference of the probabilities: {comparison['max_abs_difference']:.4f}")
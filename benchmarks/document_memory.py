@@ -0,0 +1,59 @@
+"""
+Compares the memory and the pickling cost of the output of the pipeline as :class:`Word <lib.document.Word>` objects and
+as dicts in the json shape, per 10k tokens. The slots of a word save only part of the memory of a dict, and pickling
+words is slower than pickling dicts. Between processes documents are handed off by
+:func:`to_buffer <lib.document.to_buffer>` instead, see ``benchmarks/queue_hand_off.py``.
+
+.. code-block:: bash
+
+    python benchmarks/document_memory.py --configfile tests/test_data/server/config_test.json
+"""
+import argparse
+import json
+import os.path as op
+import pickle
+import time
+
+from lib.document import to_json
+from lib.ner_lists.registry import deep_getsizeof
+from lib.pipeline import Pipeline
+
+TEST_DATA_DIR = op.join(op.dirname(__file__), '..', 'tests', 'test_data')
+
+
+def pickle_time(document, repeat: int = 5):
+    """
+    :return: The size in bytes of the pickled document and the time to pickle and unpickle it in seconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = pickle.dumps(document)
+        pickle.loads(data)
+    return len(data), (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--configfile', type=str, default=op.join(TEST_DATA_DIR, 'server', 'config_test.json'))
+    parser.add_argument('--textfile', type=str, default=op.join(TEST_DATA_DIR, 'AN_disk1_ZIPs_7538_alto.txt'))
+    args = parser.parse_args()
+    with open(args.configfile) as f:
+        config = json.load(f)
+    with open(args.textfile) as f:
+        text = f.read()
+
+    document = Pipeline(config)(text)
+    nr_tokens = sum(len(sentence) for sentence in document)
+    per_10k = 10000 / nr_tokens
+    print(f'{nr_tokens} tokens, steps {tuple(config)}')
+    measured = {}
+    for name, representation in (('dict', to_json(document)), ('Word', document)):
+        size = deep_getsizeof(representation)
+        pickled_size, seconds = pickle_time(representation)
+        measured[name] = size, seconds
+        print(f'{name}: {size * per_10k / 2 ** 20:.2f} MiB, pickled {pickled_size * per_10k / 2 ** 20:.2f} MiB '
+              f'in {seconds * per_10k * 1000:.1f} ms per 10k tokens')
+    memory_change = measured['Word'][0] / measured['dict'][0] - 1
+    pickle_change = measured['Word'][1] / measured['dict'][1] - 1
+    print(f'Word instead of dict: {100 * memory_change:+.0f}% memory, {100 * pickle_change:+.0f}% time to pickle and '
+          f'unpickle')
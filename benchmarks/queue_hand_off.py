@@ -0,0 +1,98 @@
+"""
+Compares the cost of handing off a document from one stage of :mod:`server.parallel_support` to the next: pickling the
+:class:`Document <lib.document.Document>` through the queue, pickling its columnar buffer through the queue, or only a
+shared memory descriptor, see :class:`DocumentHandle <server.parallel_support.DocumentHandle>`. The server picks one of
+these by the size of the document, see :meth:`Work.pack <server.parallel_support.Work.pack>`. The time is measured from
+before the put until the other process has loaded the document.
+
+.. code-block:: bash
+
+    python benchmarks/queue_hand_off.py --configfile tests/test_data/server/config_test.json --tokens 1000 10000 100000
+"""
+import argparse
+import json
+import os.path as op
+import pickle
+import statistics
+import time
+from multiprocessing import Process, Queue, resource_tracker
+
+from lib.document import Document
+from lib.pipeline import Pipeline
+from server.parallel_support import DocumentHandle, Work
+
+TEST_DATA_DIR = op.join(op.dirname(__file__), '..', 'tests', 'test_data')
+
+METHODS = {
+    'pickle': lambda document: document,
+    'columnar': lambda document: DocumentHandle(document, min_shared_bytes=None),
+    'shared_memory': lambda document: DocumentHandle(document, min_shared_bytes=0),
+    'server': lambda document: packed(document),
+}
+
+
+def packed(document: Document):
+    work = Work(None, document)
+    work.pack()
+    return work.data
+
+
+def load(q: Queue, done_q: Queue):
+    while True:
+        data = q.get()
+        if data is None:
+            break
+        if isinstance(data, DocumentHandle):
+            data = data.load()
+        done_q.put(sum(len(sentence) for sentence in data))
+
+
+def document_of_size(document: Document, nr_tokens: int):
+    """
+    :return: A document of at least nr_tokens tokens made of copies of the sentences of the document
+    """
+    sentences = []
+    total = 0
+    while total < nr_tokens:
+        # copy, so the repeated sentences do not share their values
+        for sentence in pickle.loads(pickle.dumps(document)):
+            sentences.append(sentence)
+            total += len(sentence)
+            if total >= nr_tokens:
+                break
+    return Document(sentences)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--configfile', type=str, default=op.join(TEST_DATA_DIR, 'server', 'config_test.json'))
+    parser.add_argument('--textfile', type=str, default=op.join(TEST_DATA_DIR, 'AN_disk1_ZIPs_7538_alto.txt'))
+    parser.add_argument('--tokens', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    with open(args.configfile) as f:
+        config = json.load(f)
+    with open(args.textfile) as f:
+        text = f.read()
+    document = Pipeline(config)(text)
+
+    resource_tracker.ensure_running()
+    q, done_q = Queue(), Queue()
+    process = Process(target=load, args=(q, done_q), daemon=True)
+    process.start()
+    for nr_tokens in args.tokens:
+        sized = document_of_size(document, nr_tokens)
+        size = len(pickle.dumps(sized))
+        # whole sentences are copied, so the document can have more tokens than asked for
+        nr_tokens = sum(len(sentence) for sentence in sized)
+        for name, pack in METHODS.items():
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                q.put(pack(sized))
+                done_q.get()
+                times.append(time.perf_counter() - start)
+            print(f'{nr_tokens} tokens ({size / 2 ** 20:.1f} MiB pickled), {name}: '
+                  f'{statistics.median(times) * 1000:.1f} ms')
+    q.put(None)
+    process.join()
@@ -0,0 +1,67 @@
+"""
+Measures the latency of the /pipeline endpoint of a running server under concurrent load.
+
+Start a server first, e.g. ``python server/fast_server.py --configfile server/config_NA.json``, then run:
+
+.. code-block:: bash
+
+    python benchmarks/server_latency.py --clients 32 --requests_per_client 10
+"""
+import argparse
+import os.path as op
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+TEST_DATA_DIR = op.join(op.dirname(__file__), '..', 'tests', 'test_data')
+
+
+def timed_request(url: str, json_data: dict) -> float:
+    """
+    :param url: The url of the pipeline endpoint
+    :param json_data: The post-data for the request
+    :return: Latency of the request in seconds
+    """
+    start = time.perf_counter()
+    response = requests.post(url=url, json=json_data)
+    latency = time.perf_counter() - start
+    assert response.json()['message'] == 'Success', response.json()['message']
+    return latency
+
+
+def run(url: str, text: str, clients: int, requests_per_client: int):
+    """
+    :param url: The url of the pipeline endpoint
+    :param text: The text to send as "input_data" in each request
+    :param clients: The number of clients that send requests concurrently
+    :param requests_per_client: The number of consecutive requests each client sends
+    :return: The latencies of all requests in seconds and the total wall time
+    """
+    def client(nr):
+        return [timed_request(url, {"input_data": f"{nr}\n{text}"}) for _ in range(requests_per_client)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = [latency for client_latencies in executor.map(client, range(clients))
+                     for latency in client_latencies]
+    return np.array(latencies), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', type=str, default='http://0.0.0.0:5005/pipeline')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests_per_client', type=int, default=10)
+    parser.add_argument('--textfile', type=str, default=op.join(TEST_DATA_DIR, 'ocrtext.txt'))
+    args = parser.parse_args()
+    with open(args.textfile) as f:
+        input_text = f.read()
+
+    all_latencies, wall_time = run(args.url, input_text, args.clients, args.requests_per_client)
+    print(f'{len(all_latencies)} requests from {args.clients} concurrent clients in {wall_time:.2f} s '
+          f'({len(all_latencies) / wall_time:.2f} requests/s)')
+    for percentile in (50, 90, 99):
+        print(f'p{percentile}: {1000 * np.percentile(all_latencies, percentile):.1f} ms')
+    print(f'max: {1000 * all_latencies.max():.1f} ms')
@@ -0,0 +1,39 @@
+"""
+Compares the corrections and the speed of the spellchecker engines of
+:class:`FreqTableCleanUp <lib.post_correction.freq_table_clean_up.FreqTableCleanUp>`.
+
+.. code-block:: bash
+
+    python benchmarks/spellchecker_engines.py --textfile tests/test_data/AN_disk1_ZIPs_7538_alto.txt
+"""
+import argparse
+import os.path as op
+import time
+
+from lib.post_correction.freq_table_clean_up import FreqTableCleanUp, ENGINES
+
+TEST_DATA_DIR = op.join(op.dirname(__file__), '..', 'tests', 'test_data')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--textfile', type=str, default=op.join(TEST_DATA_DIR, 'AN_disk1_ZIPs_7538_alto.txt'))
+    parser.add_argument('--table', type=str, default='post_correction')
+    args = parser.parse_args()
+    with open(args.textfile) as f:
+        words = f.read().split()
+
+    corrections = {}
+    for engine in ENGINES:
+        start = time.perf_counter()
+        clean_up = FreqTableCleanUp(args.table, engine=engine)
+        init_time = time.perf_counter() - start
+        start = time.perf_counter()
+        corrections[engine] = [clean_up(word) for word in words]
+        correction_time = time.perf_counter() - start
+        print(f'{engine}: initialization {init_time:.2f} s, {len(words)} words corrected in {correction_time:.3f} s')
+
+    reference, *others = corrections
+    for engine in others:
+        differences = sum(a != b for a, b in zip(corrections[reference], corrections[engine]))
+        print(f'{engine} differs from {reference} for {differences} words')
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Tuple
 import logging
 import numpy as np
 from tensorflow import one_hot
@@ -43,6 +43,8 @@ class InputDataSentence:
                        for tokenized_word in self.tokenized for label in tokenized_word.labels]
         self.ids = [idx for tokenized_word in self.tokenized for idx in tokenized_word.ids]
         self.fits = len(self.ids) <= self.max_length
+        # position of the first token in the row that is fed to BERT, only non-zero if the sentence is packed
+        self.offset = 0
 
     @classmethod
     def get_sentence_data_list(cls, sentence, tokenizer, max_length, vocab, labels, do_one_hot=True):
@@ -52,6 +54,60 @@ class InputDataSentence:
                      ] + tokenized_words + [Tokenized('', ['[SEP]'], tokenizer, mask=0, label='<PAD>')]
         return cls(sentence, tokenized, max_length, vocab, do_one_hot=do_one_hot)
 
+    @classmethod
+    def get_windowed_sentence_data(cls, sentence, tokenizer, max_length, vocab, labels, window_overlap,
+                                   do_one_hot=True):
+        """
+        :param sentence: A sentence to tokenize
+        :param tokenizer: The tokenizer to use
+        :param max_length: max_length for a sentence
+        :param vocab: a list of vocabulary for the network to be used (e.g. ['O', '<PAD>', 'B-PER', ...]
+        :param labels: labels (if any)
+        :param window_overlap: the number of tokens by which consecutive windows overlap (approximately, as windows
+            always start at a word)
+        :param do_one_hot: whether the labels are one_hot encodings
+        :return: the sentence data if the sentence fits, otherwise an InputDataWindowedSentence that covers the sentence
+            with overlapping windows. Each word is tokenized only once.
+        """
+        labels = labels if labels is not None else [None for _ in sentence]
+        tokenized_words = [Tokenized(word, tokenizer.tokenize(word), tokenizer, label=label)
+                           for word, label in zip(sentence, labels)]
+        cls_token = Tokenized('', ['[CLS]'], tokenizer, mask=0, label='<PAD>')
+        sep_token = Tokenized('', ['[SEP]'], tokenizer, mask=0, label='<PAD>')
+        sentence_data = cls(sentence, [cls_token] + tokenized_words + [sep_token], max_length, vocab,
+                            do_one_hot=do_one_hot)
+        if sentence_data.fits:
+            return sentence_data
+
+        LOGGER.info(f"Sentence too long, {len(sentence_data.ids)} > {max_length}, using sliding windows!")
+        capacity = max_length - 2  # room for [CLS] and [SEP]
+        stride = max(capacity - window_overlap, 1)
+        token_starts = np.cumsum([0] + [len(word.tokens) for word in tokenized_words]).tolist()
+        word_ranges = []
+        start = 0
+        while True:
+            end = start + 1  # a window always contains at least one word
+            while end < len(tokenized_words) and token_starts[end + 1] - token_starts[start] <= capacity:
+                end += 1
+            word_ranges.append((start, end))
+            if end == len(tokenized_words):
+                break
+            next_start = start + 1
+            while next_start < end and token_starts[next_start] < token_starts[start] + stride:
+                next_start += 1
+            start = next_start
+
+        windows = []
+        for start, end in word_ranges:
+            window_words = tokenized_words[start:end]
+            if token_starts[end] - token_starts[start] > capacity:
+                word = window_words[0]
+                LOGGER.warning(f"Word too long, {len(word.tokens)} > {capacity}, truncating its tokens!")
+                window_words = [Tokenized(word.word, word.tokens[:capacity], tokenizer, label=word.labels[0])]
+            windows.append(cls(sentence[start:end], [cls_token] + window_words + [sep_token], max_length, vocab,
+                               do_one_hot=do_one_hot))
+        return InputDataWindowedSentence(sentence, windows, word_ranges)
+
     @classmethod
     def get_fitting_sentence_data_list(cls, sentence, tokenizer, max_length, vocab, labels,
                                        split_long_sentences=False, do_one_hot=True):
@@ -105,7 +161,7 @@ class InputDataSentence:
             f"The list of labels should either be as long as the number of tokens in the sentence, or the max_length " \
             f"for this datasupplier. Got a list of length {len(labels)}, it should be either " \
             f"{len(self.labels)} or {self.max_length}"
-        i_token = 0
+        i_token = self.offset
         word_labels = []
         for tokenized_word in self.tokenized:
             word_label_list = []
@@ -127,10 +183,117 @@ class InputDataSentence:
         return word_labels
 
 
+class InputDataWindowedSentence:
+    def __init__(self, sentence, windows: List[InputDataSentence], word_ranges: List[Tuple[int, int]]):
+        """
+        Class that defines a sentence that is too long to fit in max_length, covered by overlapping windows
+        :param sentence: the text, kept primarily as a reference/sanity check
+        :param windows: the sentence data for each of the windows
+        :param word_ranges: the begin and end index of the words of the sentence in each window
+        """
+        self.sentence = sentence
+        self.windows = windows
+        self.word_ranges = word_ranges
+
+        # for each word use the window in which it is furthest away from the edges, i.e. has the most context
+        self.word_windows = [None] * len(sentence)
+        distances = [-1] * len(sentence)
+        for i_window, (start, end) in enumerate(word_ranges):
+            for i_word in range(start, end):
+                distance = min(i_word - start, end - 1 - i_word)
+                if distance > distances[i_word]:
+                    distances[i_word] = distance
+                    self.word_windows[i_word] = i_window
+
+    def inverse_apply_labels(self, labelss, trim_ends=False, **kwargs):
+        """
+        Applies labels for the windows back to the words of the sentence, merging the overlapping windows
+        :param labelss: A list of labels for each of the windows
+        :param trim_ends: Whether to trim the ends ([CLS] and [SEP] labels)
+        :param kwargs: all other kwargs are passed on to InputDataSentence.inverse_apply_labels
+        :return: A list of word, label pairs
+        """
+        window_labels = [window.inverse_apply_labels(labels, trim_ends=False, **kwargs)
+                         for window, labels in zip(self.windows, labelss)]
+        word_labels = [window_labels[i_window][1 + i_word - self.word_ranges[i_window][0]]
+                       for i_word, i_window in enumerate(self.word_windows)]
+        if not trim_ends:
+            word_labels = [window_labels[0][0]] + word_labels + [window_labels[-1][-1]]
+        return word_labels
+
+
+class InputDataPackedRow:
+    def __init__(self, sentence_data: List[InputDataSentence]):
+        """
+        Class that packs several sentences into a single row of input data, so that short sentences do not each take up
+        a row of max_length tokens that consists mostly of padding. The row has the form
+        [CLS] sentence [SEP] sentence [SEP] ..., i.e. the [CLS] of every sentence but the first is left out.
+        :param sentence_data: The sentences to pack, their tokens should fit in max_length together, see
+            :meth:`pack`.
+        """
+        self.sentence_data = sentence_data
+        self.max_length = sentence_data[0].max_length
+        self.tag2idx = sentence_data[0].tag2idx
+
+        self.ids, self.masks, self.input_types, self.is_heads, self.labels = [], [], [], [], []
+        for i, data in enumerate(self.sentence_data):
+            skip = 0 if i == 0 else 1  # skip the [CLS]
+            # the labels of the skipped [CLS] are read from the preceding [SEP], they are trimmed anyway
+            data.offset = len(self.ids) - skip
+            self.ids += data.ids[skip:]
+            self.masks += data.masks[skip:]
+            self.input_types += data.input_types[skip:]
+            self.is_heads += data.is_heads[skip:]
+            self.labels += data.labels[skip:]
+        assert len(self.ids) <= self.max_length, f"Packed sentences do not fit, {len(self.ids)} > {self.max_length}"
+
+    @staticmethod
+    def packed_length(sentence_data: List[InputDataSentence]):
+        """
+        :param sentence_data: Sentences that are to be packed into a single row
+        :return: The number of tokens of the packed row
+        """
+        return sum(len(data.ids) for data in sentence_data) - len(sentence_data) + 1
+
+    @classmethod
+    def pack(cls, sentence_data: List[InputDataSentence]):
+        """
+        :param sentence_data: Sentences to pack, each of which should fit in max_length by itself.
+        :return: A list of packed rows, sentences are packed in the order in which they are given.
+        """
+        rows = []
+        row = []
+        for data in sentence_data:
+            if row and cls.packed_length(row + [data]) > data.max_length:
+                rows.append(cls(row))
+                row = []
+            row.append(data)
+        if row:
+            rows.append(cls(row))
+        return rows
+
+    def inverse_apply_labels(self, labels, **kwargs):
+        """
+        :param labels: A list of labels, one for each token in the row
+        :param kwargs: all kwargs are passed on to InputDataSentence.inverse_apply_labels
+        :return: A list of lists of word, label pairs, one for each of the packed sentences
+        """
+        return [data.inverse_apply_labels(labels, **kwargs) for data in self.sentence_data]
+
+
 class InputData:
     def __init__(self, sentence_data: List[InputDataSentence], tokenizer, max_length: int,
-                 do_one_hot=True):
+                 do_one_hot=True, sentences: Optional[List] = None):
+        """
+        :param sentence_data: the rows of input data, either InputDataSentence or InputDataPackedRow
+        :param sentences: the sentences to which labels are mapped back by inverse_apply_labels, either
+            InputDataSentence or InputDataWindowedSentence. By default these are the InputDataSentence in sentence_data.
+        """
         self.sentence_data = sentence_data
+        if sentences is None:
+            sentences = [data for row in sentence_data
+                         for data in (row.sentence_data if isinstance(row, InputDataPackedRow) else [row])]
+        self.sentences = sentences
 
         self.tokenizer = tokenizer
         self.max_length = max_length
@@ -139,6 +302,7 @@ class InputData:
         self.masks = self._list2array([data.masks for data in self.sentence_data])
         self.input_types = self._list2array([data.input_types for data in self.sentence_data])
         self.is_heads = self._list2array([data.is_heads for data in self.sentence_data])
+        self.lengths = np.array([len(data.ids) for data in self.sentence_data], dtype='int32')
 
         nr_tags = self._safe_get_nr_tags(sentence_data)
 
@@ -179,7 +343,7 @@ class InputData:
 
     @classmethod
     def from_sentences(cls, sentences, tokenizer, max_length, vocab,
-                       split_long_sentences=True, do_one_hot=True):
+                       split_long_sentences=True, do_one_hot=True, pack_sentences=False, window_overlap=None):
         """
         Read a ground truth file into an InputData object
         :param sentences: a list of list of words
@@ -188,17 +352,36 @@ class InputData:
         :param do_one_hot: whether to use one_hot encoding
         :param vocab: a list of the vocab O, <PAD>, B-PER, ...
         :param split_long_sentences: whether to split long sentences into shorter ones or to ignore them
+        :param pack_sentences: whether to pack multiple sentences into a single row, see InputDataPackedRow
+        :param window_overlap: if given, long sentences are covered by sliding windows that overlap by this many tokens
+            instead of being split in halves, see InputDataWindowedSentence. split_long_sentences is then ignored.
         :return:
         """
-        sentence_data = []
-        for sentence in sentences:
-            appenda = InputDataSentence.get_fitting_sentence_data_list(
-                sentence, tokenizer, max_length, vocab,
-                labels=None,  # no labels!
-                split_long_sentences=split_long_sentences
-            )
-            sentence_data += appenda
-        return cls(sentence_data, tokenizer, max_length, do_one_hot=do_one_hot)
+        if window_overlap is not None:
+            windowed_sentences = [
+                InputDataSentence.get_windowed_sentence_data(
+                    sentence, tokenizer, max_length, vocab,
+                    labels=None,  # no labels!
+                    window_overlap=window_overlap
+                )
+                for sentence in sentences
+            ]
+            sentence_data = [window for sentence in windowed_sentences
+                             for window in (sentence.windows if isinstance(sentence, InputDataWindowedSentence)
+                                            else [sentence])]
+        else:
+            windowed_sentences = None
+            sentence_data = []
+            for sentence in sentences:
+                appenda = InputDataSentence.get_fitting_sentence_data_list(
+                    sentence, tokenizer, max_length, vocab,
+                    labels=None,  # no labels!
+                    split_long_sentences=split_long_sentences
+                )
+                sentence_data += appenda
+        if pack_sentences:
+            sentence_data = InputDataPackedRow.pack(sentence_data)
+        return cls(sentence_data, tokenizer, max_length, do_one_hot=do_one_hot, sentences=windowed_sentences)
 
     @staticmethod
     def _safe_get_nr_tags(sentence_data: List[InputDataSentence]):
@@ -210,6 +393,26 @@ class InputData:
     def get_x(self):
         return [self.ids, self.masks, self.input_types, self.is_heads]
 
+    def length_buckets(self, max_batch_tokens: int):
+        """
+        Groups the rows into batches of similar length, so that a BERT that accepts variable sequence lengths only has
+        to process each batch up to its longest row instead of up to max_length.
+        :param max_batch_tokens: the maximum number of tokens in a batch, padding included. A batch always contains at
+            least one row.
+        :return: a list of (row indices, length) tuples, one for each batch
+        """
+        buckets = []
+        rows = []
+        for row in np.argsort(self.lengths, kind='stable'):
+            # rows come in increasing length, so the length of the batch is that of the row being added
+            if rows and (len(rows) + 1) * self.lengths[row] > max_batch_tokens:
+                buckets.append((np.array(rows), int(self.lengths[rows[-1]])))
+                rows = []
+            rows.append(row)
+        if rows:
+            buckets.append((np.array(rows), int(self.lengths[rows[-1]])))
+        return buckets
+
     def get_y(self):
         return self.labels
 
@@ -230,10 +433,19 @@ class InputData:
         """
         assert len(labelss) == len(self.sentence_data), f'Length of results does not match length of sentence_data!\n' \
                                                         f'{len(labelss)} != {len(self.sentence_data)}'
-        return [
-            sentence_data.inverse_apply_labels(labels, **kwargs)
-            for sentence_data, labels in zip(self.sentence_data, labelss)
-        ]
+        # the labels of a packed row are shared by all sentences in the row, each knows its own offset
+        sentence_labels = {}
+        for row, labels in zip(self.sentence_data, labelss):
+            for sentence_data in (row.sentence_data if isinstance(row, InputDataPackedRow) else [row]):
+                sentence_labels[id(sentence_data)] = labels
+        word_labels = []
+        for sentence in self.sentences:
+            if isinstance(sentence, InputDataWindowedSentence):
+                labels = [sentence_labels[id(window)] for window in sentence.windows]
+            else:
+                labels = sentence_labels[id(sentence)]
+            word_labels.append(sentence.inverse_apply_labels(labels, **kwargs))
+        return word_labels
 
 
 def sentences_to_text(sentences, labels, sentence_sep="\n\n", word_sep="\n", label_sep="\t"):
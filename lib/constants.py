@@ -5,6 +5,12 @@ In particular the location of the data is defined here in a single location. The
 so that it may be overridden by tests, which are performed on smaller datasets.
 """
 
+import os
 import os.path as op
 
 DATA_DIR = op.join(op.dirname(__file__), '..', 'pipeline_data')
+# data derived from DATA_DIR that is rebuilt when it is missing or outdated, e.g. the compiled ner_lists, None to not
+# keep it
+CACHE_DIR = os.environ.get(
+    'IJSBEER_CACHE_DIR', op.join(os.environ.get('XDG_CACHE_HOME', op.join(op.expanduser('~'), '.cache')), 'ijsbeer-ai')
+)
@@ -0,0 +1,358 @@
+"""
+Compact representation of the words on which the steps of the :class:`Pipeline <lib.pipeline.Pipeline>` operate. A
+document is a list of sentences, each a list of :class:`Word`. A word behaves like the dict of a word in the
+:download:`json schema </../../lib/format.schema.json>`, so the steps can use either, but keeps its fields in slots
+instead of a dict per word. Conversion to the json shape is done by :func:`to_json` at the edge, i.e. by the server.
+For the hand-off between processes a document is encoded column by column in a single contiguous buffer by
+:func:`to_buffer`.
+"""
+import gc
+import pickle
+from collections import deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from operator import attrgetter
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# the properties of a word in format.schema.json
+WORD_KEYS = ('word', 'begin_char', 'end_char', 'ner', 'post_correction', 'modernisation',
+             'remove_whitespace_for_modernisation', 'bio', 'entity_chars', 'labels')
+_KEY_SET = frozenset(WORD_KEYS)
+
+
+class Word(MutableMapping):
+    """
+    A word of a document. The fields are the keys of the word in the json schema, a field that has not been set is not
+    a key of the word. Setting a key that is not in the schema raises a KeyError.
+    """
+    __slots__ = WORD_KEYS
+
+    def __init__(self, word: str, begin_char: int, end_char: int, ner: bool = True):
+        """
+        :param word: The word, e.g. "Weerld!"
+        :param begin_char: The position of the first character in the original text
+        :param end_char: The position after the last character in the original text
+        :param ner: Whether the word should be used for named entity recognition
+        """
+        self.word = word
+        self.begin_char = begin_char
+        self.end_char = end_char
+        self.ner = ner
+
+    @classmethod
+    def from_dict(cls, fields: Mapping):
+        """
+        :param fields: A word in the json shape
+        :return: The word with the same fields
+        """
+        word = cls.__new__(cls)
+        for key, value in fields.items():
+            word[key] = value
+        return word
+
+    def __getitem__(self, key):
+        if key not in _KEY_SET:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in _KEY_SET:
+            raise KeyError(f"{key} is not a property of a word in format.schema.json")
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in _KEY_SET:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in _KEY_SET and hasattr(self, key)
+
+    def __iter__(self):
+        return (key for key in WORD_KEYS if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def get(self, key, default=None):
+        if key not in _KEY_SET:
+            return default
+        return getattr(self, key, default)
+
+    def copy(self):
+        """
+        :return: A shallow copy of the word, like dict.copy
+        """
+        word = Word.__new__(Word)
+        for key in self:
+            setattr(word, key, getattr(self, key))
+        return word
+
+
+class _Unset:
+    """
+    Marks a field that is not set in the columns of a document, see :func:`to_buffer`.
+    """
+    def __reduce__(self):
+        return '_UNSET'
+
+
+_UNSET = _Unset()
+
+
+class Document(list):
+    """
+    A list of sentences, each a list of :class:`Word`.
+    """
+
+
+def _document_columns(document: List[List[Mapping]]) -> Tuple[List[int], List[Optional[list]]]:
+    """
+    :return: The lengths of the sentences and for each of the WORD_KEYS the values of all words, with _UNSET for the
+        words that do not have the key, or None if no word has it
+    """
+    words = [word if isinstance(word, Word) else Word.from_dict(word) for sentence in document for word in sentence]
+    columns = []
+    for key in WORD_KEYS:
+        try:
+            column = list(map(attrgetter(key), words))
+        except AttributeError:
+            column = [getattr(word, key, _UNSET) for word in words]
+            if all(value is _UNSET for value in column):
+                column = None
+        columns.append(column if words else None)
+    return [len(sentence) for sentence in document], columns
+
+
+def _document_from_columns(lengths: List[int], columns: List[Optional[list]]):
+    words = [Word.__new__(Word) for _ in range(sum(lengths))]
+    for key, column in zip(WORD_KEYS, columns):
+        if column is None:
+            continue
+        setter = getattr(Word, key).__set__
+        if _UNSET in column:
+            for word, value in zip(words, column):
+                if value is not _UNSET:
+                    setter(word, value)
+        else:
+            deque(map(setter, words, column), maxlen=0)
+    document = Document()
+    begin = 0
+    for length in lengths:
+        document.append(words[begin:begin + length])
+        begin += length
+    return document
+
+
+# how the columns are encoded by to_buffer, the other columns (labels) are pickled
+STRING_KEYS = ('word', 'post_correction', 'modernisation', 'bio')
+INT_KEYS = ('begin_char', 'end_char')
+FLAG_KEYS = ('ner', 'remove_whitespace_for_modernisation')
+CHARS_KEYS = ('entity_chars',)
+# the state of a value in an int column, and the value in a flag column that is not set
+_SET, _NONE, _NOT_SET = 0, 1, 2
+_ALIGNMENT = 8
+
+
+def _encode_column(key: str, column: list, strings: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """
+    :param key: One of the WORD_KEYS
+    :param column: The values of the key, with _UNSET for the words that do not have it
+    :param strings: The interned strings and their index, to which the strings of the column are added
+    :return: The arrays that encode the column
+    :raise TypeError: If a value does not have the type of the encoding of the key
+    """
+    types = set(map(type, column))
+    if key in STRING_KEYS:
+        if not types <= {str, _Unset}:
+            raise TypeError(key)
+        for value in set(column):
+            if value is not _UNSET and value not in strings:
+                strings[value] = len(strings)
+        index = {**strings, _UNSET: -1}
+        return {key: np.array(list(map(index.__getitem__, column)), dtype=np.int32)}
+    if key in INT_KEYS:
+        if not types <= {int, type(None), _Unset}:
+            raise TypeError(key)
+        if types == {int}:
+            return {f'{key}.values': np.array(column, dtype=np.int64),
+                    f'{key}.state': np.zeros(len(column), dtype=np.uint8)}
+        return {
+            f'{key}.values': np.array([value if type(value) is int else 0 for value in column], dtype=np.int64),
+            f'{key}.state': np.array(
+                [_NOT_SET if value is _UNSET else _NONE if value is None else _SET for value in column], dtype=np.uint8
+            ),
+        }
+    if key in FLAG_KEYS:
+        if not types <= {bool, _Unset}:
+            raise TypeError(key)
+        if types == {bool}:
+            return {key: np.array(column, dtype=np.uint8)}
+        return {key: np.array([_NOT_SET if value is _UNSET else value for value in column], dtype=np.uint8)}
+    if key in CHARS_KEYS:
+        if not types <= {list, _Unset}:
+            raise TypeError(key)
+        # the words of an entity share the list of their chars, so every list is encoded once
+        lists = {id(value): value for value in column if value is not _UNSET}
+        unique = list(lists.values())
+        if not all(type(chars) is list and len(chars) == 2 and type(chars[0]) is int and type(chars[1]) is int
+                   for value in unique for chars in value):
+            raise TypeError(key)
+        index = {list_id: i for i, list_id in enumerate(lists)}
+        index[id(_UNSET)] = -1
+        return {
+            key: np.array([index[id(value)] for value in column], dtype=np.int32),
+            f'{key}.counts': np.array(list(map(len, unique)), dtype=np.int64),
+            f'{key}.chars': np.array([char for value in unique for chars in value for char in chars], dtype=np.int64),
+        }
+    raise TypeError(key)
+
+
+def _decode_column(key: str, arrays: Dict[str, np.ndarray], strings: List) -> list:
+    """
+    :param strings: The interned strings, followed by _UNSET for index -1
+    :return: The column encoded by :func:`_encode_column`
+    """
+    if key in STRING_KEYS:
+        return list(map(strings.__getitem__, arrays[key].tolist()))
+    if key in INT_KEYS:
+        values, states = arrays[f'{key}.values'], arrays[f'{key}.state']
+        if not states.any():
+            return values.tolist()
+        return [
+            value if state == _SET else None if state == _NONE else _UNSET
+            for value, state in zip(values.tolist(), states.tolist())
+        ]
+    if key in FLAG_KEYS:
+        flags = arrays[key]
+        if not (flags == _NOT_SET).any():
+            return flags.astype(bool).tolist()
+        return [_UNSET if flag == _NOT_SET else bool(flag) for flag in flags.tolist()]
+    if key in CHARS_KEYS:
+        flat = arrays[f'{key}.chars'].tolist()
+        unique = []
+        begin = 0
+        for count in arrays[f'{key}.counts'].tolist():
+            unique.append([flat[i:i + 2] for i in range(begin, begin + 2 * count, 2)])
+            begin += 2 * count
+        unique.append(_UNSET)
+        return list(map(unique.__getitem__, arrays[key].tolist()))
+    raise TypeError(key)
+
+
+@contextmanager
+def paused_gc():
+    """
+    Pauses the cyclic garbage collector, while the many objects of a document are created that do not contain reference
+    cycles. The collections that they would trigger dominate the time to load a large document otherwise.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@paused_gc()
+def to_buffer(document: List[List[Mapping]]) -> bytearray:
+    """
+    Encodes a document column by column in one contiguous buffer: the strings are interned in a single utf-8 buffer
+    with their offsets, and the character offsets, flags and string indices of the words are numpy arrays. Only the
+    labels, and columns of which a value has an unexpected type, are pickled.
+
+    :param document: A document of :class:`Word` or of words in the json shape
+    :return: The buffer, to be decoded by :func:`from_buffer`
+    """
+    lengths, columns = _document_columns(document)
+    strings: Dict[str, int] = {}
+    arrays = {'lengths': np.array(lengths, dtype=np.int64)}
+    pickled = {}
+    for key, column in zip(WORD_KEYS, columns):
+        if column is None:
+            continue
+        try:
+            arrays.update(_encode_column(key, column, strings))
+        except TypeError:
+            pickled[key] = column
+    encoded = [string.encode('utf-8', 'surrogatepass') for string in strings]
+    arrays['strings.offsets'] = np.cumsum([0] + [len(string) for string in encoded], dtype=np.int64)
+    arrays['strings.data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header = pickle.dumps((layout, pickled), protocol=pickle.HIGHEST_PROTOCOL)
+    # the arrays start after the length and the header, aligned
+    start = -(-(8 + len(header)) // _ALIGNMENT) * _ALIGNMENT
+    buffer = bytearray(start + offset)
+    buffer[:8] = len(header).to_bytes(8, 'little')
+    buffer[8:8 + len(header)] = header
+    for (name, _, _, array_offset), array in zip(layout, arrays.values()):
+        buffer[start + array_offset:start + array_offset + array.nbytes] = array.tobytes()
+    return buffer
+
+
+@paused_gc()
+def from_buffer(buffer) -> 'Document':
+    """
+    :param buffer: A buffer written by :func:`to_buffer`, e.g. a memoryview of shared memory. The arrays are read from
+        it without copying, and no reference to it is kept.
+    :return: The document
+    """
+    buffer = memoryview(buffer)
+    header_length = int.from_bytes(buffer[:8], 'little')
+    layout, pickled = pickle.loads(buffer[8:8 + header_length])
+    start = -(-(8 + header_length) // _ALIGNMENT) * _ALIGNMENT
+    arrays = {
+        name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=start + offset)
+        for name, dtype, shape, offset in layout
+    }
+    offsets = arrays['strings.offsets'].tolist()
+    data = arrays['strings.data'].tobytes()
+    strings = [data[begin:end].decode('utf-8', 'surrogatepass') for begin, end in zip(offsets[:-1], offsets[1:])]
+    strings.append(_UNSET)
+    columns = [
+        pickled[key] if key in pickled else _decode_column(key, arrays, strings) if _has_column(key, arrays) else None
+        for key in WORD_KEYS
+    ]
+    lengths = arrays['lengths'].tolist()
+    del arrays
+    buffer.release()
+    return _document_from_columns(lengths, columns)
+
+
+def _has_column(key: str, arrays: Dict[str, np.ndarray]):
+    return key in arrays or f'{key}.values' in arrays
+
+
+def from_json(sentences: List[List[Mapping]]) -> Document:
+    """
+    :param sentences: A document in the json shape, words that are already a :class:`Word` are kept
+    :return: The document with every word a :class:`Word`
+    """
+    return Document(
+        [word if isinstance(word, Word) else Word.from_dict(word) for word in sentence] for sentence in sentences
+    )
+
+
+def to_json(sentences: List[List[Mapping]]) -> List[List[Dict]]:
+    """
+    :param sentences: A document of :class:`Word`
+    :return: The document in the json shape, with every word a dict, words that are already a dict are kept
+    """
+    return [[dict(word) if isinstance(word, Word) else word for word in sentence] for sentence in sentences]
@@ -35,18 +35,35 @@ class Modernisation:
         :param sentences: List of lists of words
         :return: The same list of lists, with the fields "remove_whitespace_for_modernisation" and "modernisation" added
             to each word. The former is currently unused, but could be used if modernisation is extended to consider
-            multiple words.
+            multiple words. Each unique form of the modernisable words is modernised once and the result is copied to
+            all its occurrences.
         """
         if not all('bio' in word for sentence in sentences for word in sentence if word['ner']):
             LOGGER.info('Not all NER words contained the "bio" key, these words will be modernised.')
 
+        modernisations = {}
         for sentence in sentences:
             for word in sentence:
                 word['remove_whitespace_for_modernisation'] = False  # TODO: is this still a necessary property
-                word['modernisation'] = self._per_word(word)
+                if self._is_exempt(word):
+                    # the exemption depends on the entity of this occurrence, so it is not shared with other words
+                    word['modernisation'] = word['post_correction']
+                    continue
+                word_pc = word['post_correction']
+                if word_pc not in modernisations:
+                    modernisations[word_pc] = self._per_form(word_pc)
+                word['modernisation'] = modernisations[word_pc]
 
         return sentences
 
+    def _is_exempt(self, word: Dict):
+        """
+        :param word: The word dict to be modernised.
+        :return: Whether the word is part of an entity that should not be modernised, i.e. part of a person or location
+            name.
+        """
+        return word['ner'] and word.get('bio', 'O') not in self.modernisable_entities
+
     def _per_word(self, word: Dict):
         """
         :param word: The word dict to be modernised. The dictionary is used to determine if a word is part of an entity
@@ -54,11 +71,16 @@ class Modernisation:
         :return: Modernised form of the word. Capitalization of the first letter is kept as-is, other characters will
             all be lowercase.
         """
-        if word['ner']:
-            if word.get('bio', 'O') not in self.modernisable_entities:
-                # do not modernize words that are recognized as (parts of) entities
-                return word['post_correction']
-        word_pc = word['post_correction']
+        if self._is_exempt(word):
+            # do not modernize words that are recognized as (parts of) entities
+            return word['post_correction']
+        return self._per_form(word['post_correction'])
+
+    def _per_form(self, word_pc: str):
+        """
+        :param word_pc: The post-corrected form of a word that is not exempt from modernisation
+        :return: Modernised form of the word, see :meth:`_per_word <lib.modernisation.modernisation.Modernisation>`
+        """
         captialized = word_pc[0].isupper()
         modernized_lower: str = self._per_word_lower(word_pc.lower())
         return modernized_lower.capitalize() if captialized else modernized_lower
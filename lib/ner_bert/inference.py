@@ -7,7 +7,7 @@ class Bert(ABC):
     """
     Abstract Base Class for the BERT to be used in the pipeline. Has a factory method
     :meth:`create_bert <lib.ner_bert.inference.Bert.create_bert>` that returns either a real BERT in TensorFlow-style
-    based on a .ht weights file or a mocked BERT. PyTorch is no longer supported.
+    based on a .ht weights file, a quantized TFLite BERT or a mocked BERT. PyTorch is no longer supported.
     """
     @abstractmethod
     def __init__(self, nr_tags: int, weights_path: str = None):
@@ -35,6 +35,9 @@ class Bert(ABC):
 
             * .h5 results in a TensorFlow BERT
 
+            * .tflite results in a quantized TFLite BERT, as exported by
+              :func:`export_tflite <models.nlp.bert_home_trained.model_tflite.export_tflite>`
+
             * no extension, e.g. by passing an empty string for the weights, results in a mocked BERT
 
             Other implementations are no longer supported.
@@ -45,6 +48,9 @@ class Bert(ABC):
         elif extension == '.h5':
             from models.nlp.bert_home_trained.model import BertTF
             return BertTF(len(vocab), weights_path)
+        elif extension == '.tflite':
+            from models.nlp.bert_home_trained.model_tflite import BertTFLite
+            return BertTFLite(len(vocab), weights_path)
         elif extension == '':
             from models.nlp.mocks.mock_bert import MockBertModel
             nr_categories = (len(vocab) - 2) // 2
@@ -56,12 +56,24 @@ class MultipleBerts:
     Responsible for inference on multiple ner BERTS.
     """
 
-    def __init__(self, berts_to_use: Dict[str, List[str]]):
+    def __init__(self, berts_to_use: Dict[str, List[str]], pack_sentences: bool = False,
+                 window_overlap: Optional[int] = None, max_batch_tokens: Optional[int] = None):
         """
         :param berts_to_use: The keys of the dict indicate which BERTs to use and the values are tuples of the entities
             for which the keys should be used.
+        :param pack_sentences: Whether to pack several sentences into a single row of BERT input. This greatly reduces
+            the amount of padding BERT has to process, but the sentences in a row do see each other, so the results may
+            differ slightly from running each sentence separately.
+        :param window_overlap: If given, sentences that are too long for BERT are covered by sliding windows that
+            overlap by this many tokens, instead of being split in halves recursively.
+        :param max_batch_tokens: The number of tokens, padding included, in a batch for BERTs that accept variable
+            sequence lengths. Rows are sorted by length and each batch is only padded up to its longest row. By default
+            the batch_size of the BERT times its max_length.
         """
         self.berts_to_use = berts_to_use
+        self.pack_sentences = pack_sentences
+        self.window_overlap = window_overlap
+        self.max_batch_tokens = max_batch_tokens
         # Initialize NERs
         self.berts = dict()
         for key in self.berts_to_use.keys():
@@ -78,14 +90,27 @@ class MultipleBerts:
             and `"bio"` are added. The former includes detailed information on the BERT NER task within the `"BERT"`
             key below it. The key `"bio"` contains a top-level conclusion of what type of entity we are dealing with.
         """
+        return self.call_batch([sentences])[0]
+
+    def call_batch(self, documents: List[List[List[Dict]]]):
+        """
+        :param documents: A list of documents, each given as a list of sentences as passed to
+            :meth:`__call__ <lib.ner_bert.ner_bert.MultipleBerts.__call__>`. The sentences of all documents are run
+            through the BERTs together, which is considerably more efficient than running many small documents one by
+            one.
+        :return: The same documents, each with the information added as by
+            :meth:`__call__ <lib.ner_bert.ner_bert.MultipleBerts.__call__>`.
+        """
         # Do inference over multiple bert ners
-        ner_sentences = [[word for word in sentence if word['ner']] for sentence in sentences]
-        bert_ner_results = self._run_berts(ner_sentences)
+        ner_documents = [[[word for word in sentence if word['ner']] for sentence in sentences]
+                         for sentences in documents]
+        bert_ner_results = self._run_berts([sentence for ner_sentences in ner_documents for sentence in ner_sentences])
 
         # Merge the results
         # we use the mutability of each word dict
         # while adding the result to each word, we don't have to know where it fits in the list of sentences
         all_ner_words = [word
+                         for ner_sentences in ner_documents
                          for sentence in ner_sentences
                          for word in sentence]
         all_results = [{model_name: word_result}
@@ -98,8 +123,10 @@ class MultipleBerts:
             ner_word['labels'] = ner_word.get('labels', {})  # add the labels key if it does not yet exist
             ner_word['labels']['BERT'] = self._map_bert_results(results)
             ner_word['bio'] = self._draw_conclusion(ner_word)
-        self._add_entity_be_chars(all_ner_words)
-        return sentences
+        # entities should not run from the end of one document into the next
+        for ner_sentences in ner_documents:
+            self._add_entity_be_chars([word for sentence in ner_sentences for word in sentence])
+        return documents
 
     @staticmethod
     def _add_entity_be_chars(words: List[Dict]):
@@ -211,10 +238,33 @@ class MultipleBerts:
             vocab = BERTS[model_name]['vocab']
 
             sentences_for_ner = [[word[word_form] for word in sentence] for sentence in ner_sentences]
-            input_data = InputData.from_sentences(sentences_for_ner, bert.tokenizer, bert.max_length, vocab)
+            input_data = InputData.from_sentences(sentences_for_ner, bert.tokenizer, bert.max_length, vocab,
+                                                  pack_sentences=self.pack_sentences,
+                                                  window_overlap=self.window_overlap)
 
             # Inference
-            result = bert(input_data.get_x())
+            result = self._predict(bert, input_data)
             results[model_name] = input_data.inverse_apply_labels(result, trim_ends=True)
 
         return results
+
+    def _predict(self, bert: Bert, input_data: InputData):
+        """
+        :param bert: The BERT to run
+        :param input_data: The input for the BERT
+        :return: The predictions for all rows of input_data, padded to its max_length. If the BERT accepts variable
+            sequence lengths, it is run on length-bucketed batches, see
+            :meth:`length_buckets <data_suppliers.text.nerbio.data_classes.InputData.length_buckets>`.
+        """
+        if not getattr(bert, 'dynamic_length', False) or input_data.size == 0:
+            return bert(input_data.get_x())
+        max_batch_tokens = self.max_batch_tokens or bert.batch_size * bert.max_length
+        x = input_data.get_x()
+        result = None
+        for rows, length in input_data.length_buckets(max_batch_tokens):
+            batch_result = np.asarray(bert([inputs[rows, :length] for inputs in x]))
+            if result is None:
+                result = np.zeros((input_data.size, input_data.max_length, batch_result.shape[-1]),
+                                  dtype=batch_result.dtype)
+            result[rows, :length] = batch_result
+        return result
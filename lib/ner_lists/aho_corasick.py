@@ -0,0 +1,61 @@
+from collections import deque
+from typing import Iterable, List, Tuple, Dict, Optional
+
+
+class TokenAutomaton:
+    """
+    Aho-Corasick automaton over sequences of tokens, e.g. the lowercased words of the searchables of a list. A single
+    pass over a sentence finds all occurrences of all sequences, including overlapping ones.
+    """
+    def __init__(self, sequences: Iterable[Tuple[str, ...]]):
+        """
+        :param sequences: The non-empty token sequences to find
+        """
+        # node 0 is the root, the trie edges of each node are in goto, fail points to the node of the longest proper
+        # suffix of the node that is in the trie, and output_link to the nearest node in the fail chain with an output
+        self.goto: List[Dict[str, int]] = [{}]
+        self.outputs: List[Optional[Tuple[str, ...]]] = [None]
+        for sequence in sequences:
+            if not sequence:
+                raise ValueError("Cannot find empty sequences")
+            node = 0
+            for token in sequence:
+                if token not in self.goto[node]:
+                    self.goto.append({})
+                    self.outputs.append(None)
+                    self.goto[node][token] = len(self.goto) - 1
+                node = self.goto[node][token]
+            self.outputs[node] = tuple(sequence)
+        self.fail = [0] * len(self.goto)
+        self.output_link = [0] * len(self.goto)
+        self._build_links()
+
+    def _build_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                fail = self.fail[node]
+                while fail and token not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(token, 0)
+                self.fail[child] = fail
+                self.output_link[child] = fail if self.outputs[fail] is not None else self.output_link[fail]
+                queue.append(child)
+
+    def find(self, tokens: List[str]):
+        """
+        :param tokens: The tokens to search, e.g. the lowercased words of a sentence
+        :return: *Yields* (begin, end, sequence) for each occurrence, ordered by end, and by decreasing length for the
+            same end
+        """
+        node = 0
+        for end, token in enumerate(tokens, start=1):
+            while node and token not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(token, 0)
+            match = node if self.outputs[node] is not None else self.output_link[node]
+            while match:
+                sequence = self.outputs[match]
+                yield end - len(sequence), end, sequence
+                match = self.output_link[match]
@@ -0,0 +1,102 @@
+"""
+Scores a word against many strings at once, giving the same results as
+:meth:`FuzzyMatcher.get_close_matches_scores <lib.ner_lists.fuzzy_matcher.FuzzyMatcher.get_close_matches_scores>`.
+
+The score is the ratio of difflib.SequenceMatcher, 2M / T with M the number of characters in the matching blocks and T
+the summed length of the strings. The matching blocks form a common subsequence, so 2 LCS / T, with LCS the length of
+the longest common subsequence, is an upper bound of the ratio. The LCS of the word with all strings is computed in a
+single vectorized pass with the bit-parallel algorithm of Hyyrö (2004) on padded arrays of character codes, and the
+exact ratio is only computed for the strings of which the bound reaches the cutoff, in order of decreasing bound until
+the bound drops below the n-th best ratio found. Scores, cutoff behaviour and the order of the results are therefore
+identical to those of SequenceMatcher.
+"""
+from difflib import SequenceMatcher
+from heapq import heappush, heapreplace
+from typing import List, Iterable, Optional
+
+import numpy as np
+
+# the LCS of the word is computed in the bits of an unsigned 64-bit integer
+MAX_WORD_LENGTH = 64
+# number of set bits of each byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+class BatchScorer:
+    """
+    Holds a fixed list of strings as an array of character codes, padded with 0, to score words against.
+    """
+    def __init__(self, strings: List[str]):
+        """
+        :param strings: The strings to score against, e.g. the keys of a tree
+        """
+        self.strings = list(strings)
+        self.alphabet = {char: code for code, char in enumerate(sorted(set(''.join(self.strings))), start=1)}
+        self.lengths = np.array([len(string) for string in self.strings], dtype=np.int64)
+        self.codes = np.zeros((len(self.strings), max(self.lengths, default=0)), dtype=np.int32)
+        for i, string in enumerate(self.strings):
+            self.codes[i, :len(string)] = [self.alphabet[char] for char in string]
+
+    def lcs_lengths(self, word: str, indices: Optional[np.ndarray] = None):
+        """
+        :param word: A word of at most MAX_WORD_LENGTH characters
+        :param indices: The indices of the strings to compare with, by default all
+        :return: The length of the longest common subsequence of the word with each of the strings
+        """
+        if len(word) > MAX_WORD_LENGTH:
+            raise ValueError(f'Words can have at most {MAX_WORD_LENGTH} characters')
+        codes = self.codes if indices is None else self.codes[indices]
+        lengths = self.lengths if indices is None else self.lengths[indices]
+        # match masks: bit i is set for the character code of word[i], the padding code 0 has no bits set
+        match_masks = np.zeros(len(self.alphabet) + 1, dtype=np.uint64)
+        for i, char in enumerate(word):
+            if char in self.alphabet:
+                match_masks[self.alphabet[char]] |= np.uint64(1 << i)
+        word_mask = np.uint64((1 << len(word)) - 1) if word else np.uint64(0)
+        v = np.full(len(codes), word_mask, dtype=np.uint64)
+        for j in range(int(lengths.max(initial=0))):
+            u = v & match_masks[codes[:, j]]
+            v = ((v + u) | (v - u)) & word_mask
+        return len(word) - _POPCOUNT[v.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+    def get_close_matches_scores(self, word: str, n: Optional[int], cutoff: float,
+                                 indices: Optional[Iterable[int]] = None):
+        """
+        :param word: a string, might be multiple words concatenated without spaces.
+        :param n: positive integer. the top-n matches will be returned, all matches if None.
+        :param cutoff: percentage of characters that should match before something is considered a match
+        :param indices: the indices of the strings to consider, by default all
+        :return: the same as :meth:`FuzzyMatcher.get_close_matches_scores` for the strings as possibilities
+        """
+        if n is not None and not n > 0:
+            raise ValueError("n must be > 0: %r" % (n,))
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError("cutoff must be in [0.0, 1.0]: %r" % (cutoff,))
+        indices = np.arange(len(self.strings)) if indices is None else np.fromiter(indices, dtype=np.int64)
+        if len(word) <= MAX_WORD_LENGTH and len(indices):
+            total_lengths = self.lengths[indices] + len(word)
+            # the ratio is computed as by SequenceMatcher, so the bound and the ratio are rounded in the same way
+            bounds = np.where(total_lengths > 0, 2.0 * self.lcs_lengths(word, indices) / np.maximum(total_lengths, 1),
+                              1.0)
+            # visit the strings with the highest bound first, so the n best matches are found early
+            order = np.argsort(-bounds, kind='stable')
+            order = order[bounds[order] >= cutoff]
+            indices, bounds = indices[order], bounds[order]
+        else:
+            bounds = np.ones(len(indices))
+        best_matches = []
+        s = SequenceMatcher()
+        s.set_seq2(word)
+        for i, bound in zip(indices, bounds):
+            # as in FuzzyMatcher.get_close_matches_scores, the n-th best match so far is the cutoff, and an equal ratio
+            # can still win the tie on the string
+            if len(best_matches) == n and bound < best_matches[0][0]:
+                break
+            s.set_seq1(self.strings[i])
+            ratio = s.ratio()
+            if ratio >= cutoff:
+                if n is None or len(best_matches) < n:
+                    heappush(best_matches, (ratio, self.strings[i]))
+                elif (ratio, self.strings[i]) > best_matches[0]:
+                    heapreplace(best_matches, (ratio, self.strings[i]))
+        return sorted(best_matches, reverse=True)
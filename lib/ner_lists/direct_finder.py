@@ -2,6 +2,7 @@ from os import path as op
 from typing import Dict, List
 
 from lib import constants
+from lib.ner_lists.aho_corasick import TokenAutomaton
 from lib.ner_lists.entity import Entity
 from lib.ner_lists.finder import Finder, FindEntities
 
@@ -18,14 +19,18 @@ class DirectFinder(Finder):
         :param word_getter: See :class:`Finder`
         """
         filepath = op.join(constants.DATA_DIR, data_dir, 'direct', entity_type)
-        searchable_lists = self.create_lists(filepath)
-        entity_finders = {
-            name: FindEntitiesGivenDirectList(searchable_list)
-            for name, searchable_list in searchable_lists.items()
-        }
+        entity_finders = self.load_entity_finders(filepath)
 
         super().__init__(entity_type, entity_finders, word_getter)
 
+    @classmethod
+    def build_entity_finder(cls, searchable_list: Dict):
+        """
+        :param searchable_list: A list, as returned by :func:`load_file <lib.ner_lists.finder.load_file>`
+        :return: A direct list finder for the list
+        """
+        return FindEntitiesGivenDirectList(searchable_list)
+
 
 class FindEntitiesGivenDirectList(FindEntities):
     """
@@ -36,36 +41,37 @@ class FindEntitiesGivenDirectList(FindEntities):
         :param direct_list: The list to search, given by a dictionary where the keys are the searchables and the values
             represent the (canonical) information on each entity.
         """
-        self.grouped_list = self._group_list_by_length(direct_list)
+        self.direct_list = direct_list
+        self.automaton = TokenAutomaton(direct_list.keys())
+        # entities are returned grouped by the number of words of the searchable, in order of first occurrence in the
+        # list, and by position within a group
+        self.length_ranks = {}
+        for searchable in direct_list:
+            self.length_ranks.setdefault(len(searchable), len(self.length_ranks))
         super().__init__()
 
     def __call__(self, i_sentence: int, sentence: List[Dict]) -> List[Entity]:
         results = []
-        self.sentence_length = len(sentence)
-        for i in self.grouped_list.keys():
-            for j in range(self.sentence_length-i+1):
-                candidate = tuple(w.lower() for w in sentence[j:j+i])
-                if candidate in self.grouped_list[i]:
-                    for occurence in self.grouped_list[i][candidate]:
-                        results.append(Entity(
-                            sentence=i_sentence,
-                            begin=j,
-                            end=j+i,
-                            score=1.,
-                            searchable=' '.join(occurence["searchable"]),
-                            # TODO: return the tuple and then match it later
-                            canonical_form=occurence["canonical_form"],
-                            # TODO: The occurence needs to have the extra_attributes separate
-                            extra_attributes=occurence["extra_attributes"]
-                        ))
+        matches = sorted(self.automaton.find([w.lower() for w in sentence]),
+                         key=lambda match: (self.length_ranks[match[1] - match[0]], match[0]))
+        for begin, end, searchable in matches:
+            for occurence in self.direct_list[searchable]:
+                results.append(Entity(
+                    sentence=i_sentence,
+                    begin=begin,
+                    end=end,
+                    score=1.,
+                    searchable=' '.join(occurence["searchable"]),
+                    # TODO: return the tuple and then match it later
+                    canonical_form=occurence["canonical_form"],
+                    # TODO: The occurence needs to have the extra_attributes separate
+                    extra_attributes=occurence["extra_attributes"]
+                ))
         return results
 
-    @staticmethod
-    def _group_list_by_length(_list):
-        grouped_list = dict()
-        for searchable, canonical in _list.items():
-            nr_of_elements = len(searchable)
-            if nr_of_elements not in grouped_list.keys():
-                grouped_list[nr_of_elements] = {}
-            grouped_list[nr_of_elements][searchable] = canonical
-        return grouped_list
+    def with_parameters(self, **parameters):
+        """
+        :param parameters: Ignored, a direct list finder has no parameters, e.g. the cutoff_score
+        :return: This finder
+        """
+        return self
@@ -1,16 +1,23 @@
 import csv
+import hashlib
 import itertools
 import logging
 import os
+import pickle
 from os import path as op
 from abc import ABCMeta, abstractmethod
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from lib import constants
 from lib.ner_lists.entity import Entity
 from lib.ner_lists.get_searchable_words import GetWords
+from lib.ner_lists.registry import REGISTRY
 
 LOGGER = logging.getLogger(__name__)
 
+# must be increased when the pickled classes change, so indices written by older code are rebuilt
+INDEX_VERSION = 1
+
 
 class FindEntities(metaclass=ABCMeta):
     """
@@ -31,8 +38,16 @@ class FindEntities(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def with_parameters(self, **parameters):
+        """
+        :param parameters: Other parameters, e.g. the cutoff_score
+        :return: A finder with the given parameters that shares the compiled list with this one
+        """
+        pass
+
 
-class Finder:
+class Finder(metaclass=ABCMeta):
     """
     Finds entities from lists. Derived classes exist for different types of matchings.
     """
@@ -75,6 +90,103 @@ class Finder:
             lists.append(ent.to_dict(list_name=list_name, bio=bio))
             word['labels']['lists'] = lists
 
+    @classmethod
+    def load_entity_finders(cls, dirpath: str, **parameters) -> Dict[str, FindEntities]:
+        """
+        Loads the entity finders of the lists in a directory. Lists with the same contents share their compiled form
+        through the :mod:`registry <lib.ner_lists.registry>`, also when they are used with other parameters. Lists that
+        have not been loaded in this process yet are loaded from the index of the directory, see :meth:`load_index`.
+
+        :param dirpath: The directory of the lists
+        :param parameters: The parameters of :meth:`build_entity_finder`
+        :return: The entity finder of each list in the directory
+        """
+        if not op.exists(dirpath):
+            return {}
+        paths = {op.splitext(filename)[0]: op.join(dirpath, filename) for filename in cls.list_sources(dirpath)}
+        keys = {name: REGISTRY.key(cls.__name__, path) for name, path in paths.items()}
+        entity_finders = {name: REGISTRY.get(keys[name], path, parameters) for name, path in paths.items()}
+        if any(entity_finder is None for entity_finder in entity_finders.values()):
+            index = cls.load_index(dirpath, **parameters)
+            for name, entity_finder in entity_finders.items():
+                if entity_finder is None:
+                    entity_finders[name] = REGISTRY.add(keys[name], index[name], paths[name], parameters)
+        return entity_finders
+
+    @classmethod
+    @abstractmethod
+    def build_entity_finder(cls, searchables: Dict, **parameters) -> FindEntities:
+        """
+        :param searchables: A list, as returned by :func:`load_file`
+        :param parameters: The parameters of the finder
+        :return: The entity finder for the list
+        """
+        pass
+
+    @classmethod
+    def index_path(cls, dirpath: str) -> Optional[str]:
+        """
+        :param dirpath: The directory of the lists
+        :return: The path of the index file of the lists in the directory in the constants.CACHE_DIR, or None if there
+            is no cache directory
+        """
+        if constants.CACHE_DIR is None:
+            return None
+        directory_key = hashlib.sha256(op.abspath(dirpath).encode()).hexdigest()[:16]
+        return op.join(constants.CACHE_DIR, 'ner_lists', f'{cls.__name__}-{directory_key}.pickle')
+
+    @classmethod
+    def load_index(cls, dirpath: str, **parameters) -> Dict[str, FindEntities]:
+        """
+        Loads the entity finders of the lists in a directory from its index file in the cache directory, see
+        :meth:`index_path`, so the lists do not have to be parsed and compiled again. The index is rebuilt and written
+        when it does not exist, or when it was built from other list files, other parameters or an older INDEX_VERSION.
+
+        :param dirpath: The directory of the lists
+        :param parameters: The parameters of :meth:`build_entity_finder`, the index is rebuilt if they change
+        :return: The entity finder of each list in the directory
+        """
+        key = {'version': INDEX_VERSION, 'sources': cls.list_sources(dirpath), 'parameters': parameters}
+        index_path = cls.index_path(dirpath)
+        if index_path is not None and op.exists(index_path):
+            try:
+                with open(index_path, 'rb') as f:
+                    # the key is pickled separately, so an outdated index is not loaded completely
+                    if pickle.load(f) == key:
+                        return pickle.load(f)
+                LOGGER.info(f"Rebuilding outdated {index_path}")
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+                LOGGER.warning(f"Rebuilding {index_path}, it cannot be read: {e}")
+        entity_finders = {
+            name: cls.build_entity_finder(searchables, **parameters)
+            for name, searchables in cls.create_lists(dirpath).items()
+        }
+        if index_path is None:
+            return entity_finders
+        try:
+            os.makedirs(op.dirname(index_path), exist_ok=True)
+            # write to a temporary file first, so other processes never read a partially written index
+            tmp_path = f'{index_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(entity_finders, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            LOGGER.warning(f"Cannot write {index_path}: {e}")
+        return entity_finders
+
+    @staticmethod
+    def list_sources(dirpath: str) -> Dict[str, Tuple[int, int]]:
+        """
+        :param dirpath: The directory where to search for files.
+        :return: The modification time in nanoseconds and the size of each list file in the directory
+        """
+        return {
+            list_name: (os.stat(op.join(dirpath, list_name)).st_mtime_ns, os.stat(op.join(dirpath, list_name)).st_size)
+            for list_name in sorted(os.listdir(dirpath))
+            if list_name.endswith(".txt") or list_name.endswith(".csv")
+        }
+
     @staticmethod
     def create_lists(dirpath: str) -> Dict[str, Dict]:
         """
@@ -1,4 +1,5 @@
 from os import path as op
+import copy
 import logging
 from typing import List, Dict
 
@@ -16,42 +17,62 @@ class FuzzyFinder(Finder):
     Finds entities from lists where the searchable forms are *not* to be permuted but *are* to be matched fuzzily.
     An object is instantiated for each different type of entity in the project, e.g. person, location and date.
     """
-    def __init__(self, data_dir: str, entity_type: str, word_getter: str, cutoff_score: float):
+    def __init__(self, data_dir: str, entity_type: str, word_getter: str, cutoff_score: float,
+                 overlap_resolution: str = 'optimal'):
         """
         :param data_dir: Path to the data files to use relative to the pipeline_data director, e.g. "ner_lists/SZSA".
         :param entity_type: See :class:`Finder`
         :param word_getter: See :class:`Finder`
         :param cutoff_score: The lowest score for entities to still be considered a hit.
+        :param overlap_resolution: How to choose between overlapping entities, see
+            :func:`remove_overlap <lib.ner_lists.fuzzy_permutative_finder.remove_overlap>`.
         """
         filepath = op.join(constants.DATA_DIR, data_dir, 'fuzzy', entity_type)
 
-        searchable_lists = self.create_lists(filepath)
-
-        if not searchable_lists:
+        entity_finders = self.load_entity_finders(
+            filepath, cutoff_score=cutoff_score, overlap_resolution=overlap_resolution)
+        if not entity_finders:
             LOGGER.info(f"Cannot create fuzzy_lists for {filepath}, probably missing txt-files")
-        entity_finders = {
-            name: FindEntitiesGivenList(searchable_list, cutoff_score=cutoff_score)
-            for name, searchable_list in searchable_lists.items()
-        }
         super().__init__(entity_type, entity_finders, word_getter)
 
+    @classmethod
+    def build_entity_finder(cls, searchable_list: Dict, cutoff_score: float, overlap_resolution: str):
+        """
+        :param searchable_list: A list, as returned by :func:`load_file <lib.ner_lists.finder.load_file>`
+        :param cutoff_score: The lowest score for entities to still be considered a hit.
+        :param overlap_resolution: How to choose between overlapping entities, see
+            :func:`remove_overlap <lib.ner_lists.fuzzy_permutative_finder.remove_overlap>`.
+        :return: A list finder for the list
+        """
+        return FindEntitiesGivenList(searchable_list, cutoff_score=cutoff_score, overlap_resolution=overlap_resolution)
+
 
 class FindEntitiesGivenList(FindEntities):
     """
     Finds entities from a *single* list where the searchable forms are *not* to be permuted but *are* to be matched
         fuzzily.
     """
-    def __init__(self, fuzzy_list: Dict, cutoff_score: float):
+    def __init__(self, fuzzy_list: Dict, cutoff_score: float, overlap_resolution: str = 'optimal'):
         """
         :param fuzzy_list: The list to search, given by a dictionary where the keys are the searchables and the values
             represent the (canonical) information on each entity.
         :param cutoff_score: The lowest score for entities to still be considered a hit.
+        :param overlap_resolution: How to choose between overlapping entities, see
+            :func:`remove_overlap <lib.ner_lists.fuzzy_permutative_finder.remove_overlap>`.
         """
         self.tm = FuzzyListMatcher(fuzzy_list, cutoff_score)
+        self.overlap_resolution = overlap_resolution
         super().__init__()
 
     def __call__(self, i_sentence: int, sentence: List[Dict]) -> List[Entity]:
         entities = list(self.tm.find_matches(i_sentence, sentence))
         # delete overlapping entities
-        final_entities = remove_overlap(entities, len(sentence))
+        final_entities = remove_overlap(entities, len(sentence), self.overlap_resolution)
         return final_entities
+
+    def with_parameters(self, cutoff_score: float, overlap_resolution: str):
+        other = copy.copy(self)
+        other.tm = copy.copy(self.tm)
+        other.tm.cutoff_score = cutoff_score
+        other.overlap_resolution = overlap_resolution
+        return other
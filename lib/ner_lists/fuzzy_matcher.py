@@ -1,8 +1,10 @@
-import itertools
+import bisect
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher
-from heapq import nlargest
-from typing import List, Dict
+from heapq import nlargest, heappush, heapreplace
+from typing import List, Dict, Iterable
 
+from lib.ner_lists.batch_scorer import BatchScorer
 from lib.ner_lists.entity import Entity
 
 
@@ -31,6 +33,49 @@ class FuzzyMatcher:
         word_group = ''.join(word_group).lower()
 
         results = self.get_close_matches_scores(word_group, word_list, 1, cutoff_score)
+        return self.best_score(word_group, results)
+
+    def score_batch(self, word_group, scorer: BatchScorer, cutoff_score=None, indices: Iterable[int] = None):
+        """
+        :param word_group: a string, which is a concatenated list of words that are to be matched
+        :param scorer: the scorer holding the list of words to compare to, see :class:`BatchScorer`
+        :param cutoff_score: threshold for % of characters that should match between word_group and an el. of the list
+        :param indices: indices of the words of the scorer to compare to, by default all
+        :return: the same as :meth:`score` with the (selected) words of the scorer as word_list, computed for all words
+            at once
+        """
+        if cutoff_score is None:
+            cutoff_score = self.cutoff_score
+
+        word_group = ''.join(word_group).lower()
+
+        results = scorer.get_close_matches_scores(word_group, 1, cutoff_score, indices)
+        return self.best_score(word_group, results)
+
+    def best_matches(self, word_group, word_list, k: int, cutoff_score=None):
+        """
+        :param word_group: a string, which is a concatenated list of words that are to be matched
+        :param word_list: a list of (space-less concatenated) words that are compared to the word_group
+        :param k: number of matches to return
+        :param cutoff_score: threshold for % of characters that should match between word_group and an el. of word_list
+        :return: a list of at most k (score, match) tuples, best first, scored as by :meth:`score`. The cutoff is raised
+            to the k-th best score found so far while scanning, so only the k best matches are fully scored.
+        """
+        if cutoff_score is None:
+            cutoff_score = self.cutoff_score
+
+        word_group = ''.join(word_group).lower()
+
+        results = self.get_close_matches_scores(word_group, word_list, k, cutoff_score)
+        return [self.best_score(word_group, [result]) for result in results]
+
+    @staticmethod
+    def best_score(word_group: str, results):
+        """
+        :param word_group: the lowercased, concatenated word group
+        :param results: the result of :meth:`get_close_matches_scores` with n=1
+        :return: the score and the match, (0, None) if there is no match
+        """
         score = 0
         match = None
         if len(results) > 0:
@@ -48,29 +93,166 @@ class FuzzyMatcher:
         :param possibilities: list of strings. word_group will be compared to all strings in this list.
         :param n: positive integer. the top-n matches will be returned.
         :param cutoff: percentage of characters that should match before something is considered a match
-        :return: either an empty list -> no match/hit
-                or a size 2 tuple with score and word_group string
+        :return: a list of at most n (score, possibility) tuples, best first; an empty list -> no match/hit
         """
         if not n > 0:
             raise ValueError("n must be > 0: %r" % (n,))
         if not 0.0 <= cutoff <= 1.0:
             raise ValueError("cutoff must be in [0.0, 1.0]: %r" % (cutoff,))
-        matches = []
+        # min-heap of the n best (ratio, possibility) tuples so far; once it is full, the worst of them is the cutoff a
+        # possibility has to reach, so weaker possibilities are rejected by the quick ratios already
+        best_matches = []
         s = SequenceMatcher()
         s.set_seq2(word_group)
         for possibility in possibilities:
-            # TODO: there's probably a speed  gain if we replace the cutoff below with the "best score so far"
             s.set_seq1(possibility)
-            if s.real_quick_ratio() >= cutoff and \
-                    s.quick_ratio() >= cutoff:
+            # an equal ratio can still win the tie on the possibility, so only lower upper bounds are rejected
+            best_so_far = best_matches[0][0] if len(best_matches) == n else cutoff
+            if s.real_quick_ratio() >= best_so_far and \
+                    s.quick_ratio() >= best_so_far:
                 ratio = s.ratio()
                 if ratio >= cutoff:
-                    matches.append((ratio, possibility))
+                    if len(best_matches) < n:
+                        heappush(best_matches, (ratio, possibility))
+                    elif (ratio, possibility) > best_matches[0]:
+                        heapreplace(best_matches, (ratio, possibility))
 
         # Move the best scorers to head of list
-        best_match = nlargest(n, matches)
-        # Strip scores for the best n matches
-        return best_match
+        return sorted(best_matches, reverse=True)
+
+
+def ratio_cutoff_matches(length: int, cutoff: float):
+    """
+    :param length: The summed length of two strings
+    :param cutoff: A SequenceMatcher ratio
+    :return: The smallest number of matching characters for which the ratio of the two strings reaches the cutoff,
+        computed as SequenceMatcher does to get the same rounding.
+    """
+    if length == 0:
+        return 0
+    matches = max(int(cutoff * length / 2) - 1, 0)
+    while 2.0 * matches / length < cutoff:
+        matches += 1
+    return matches
+
+
+def length_ratio(length_a: int, length_b: int):
+    """
+    :return: The upper bound on the SequenceMatcher ratio of two strings with these lengths, as real_quick_ratio
+    """
+    total_length = length_a + length_b
+    return 2.0 * min(length_a, length_b) / total_length if total_length else 1.0
+
+
+class LengthBuckets:
+    """
+    Strings grouped by their length. The ratio of two strings is at most :func:`length_ratio`, so for a word and a
+    cutoff only the buckets in a range of lengths need to be visited.
+    """
+    def __init__(self, strings: List[str]):
+        """
+        :param strings: The strings to group
+        """
+        self.strings = list(strings)
+        buckets = defaultdict(list)
+        for i, string in enumerate(self.strings):
+            buckets[len(string)].append(i)
+        self.lengths = sorted(buckets)
+        self.buckets = [buckets[length] for length in self.lengths]
+
+    @staticmethod
+    def length_range(length: int, cutoff: float):
+        """
+        :param length: The length of the word
+        :param cutoff: The SequenceMatcher ratio to reach
+        :return: The lowest and highest length of strings that can reach the cutoff with the word, the highest is None
+            if there is no bound.
+        """
+        if cutoff <= 0:
+            return 0, None
+        # the length ratio increases up to the length of the word and decreases after it, the estimates are corrected
+        # with the exact ratio to get the same rounding as real_quick_ratio
+        low = int(cutoff * length / (2 - cutoff))
+        while low > 0 and length_ratio(length, low - 1) >= cutoff:
+            low -= 1
+        while low <= length and length_ratio(length, low) < cutoff:
+            low += 1
+        high = int(length * (2 - cutoff) / cutoff)
+        while length_ratio(length, high + 1) >= cutoff:
+            high += 1
+        while high >= length and length_ratio(length, high) < cutoff:
+            high -= 1
+        return low, high
+
+    def visit(self, length: int, cutoff: float):
+        """
+        :param length: The length of the word
+        :param cutoff: The SequenceMatcher ratio to reach
+        :return: *Yields* the length and indices of the strings of each bucket that can reach the cutoff
+        """
+        low, high = self.length_range(length, cutoff)
+        if high is not None and high < low:
+            return
+        begin = bisect.bisect_left(self.lengths, low)
+        end = len(self.lengths) if high is None else bisect.bisect_right(self.lengths, high)
+        for bucket in range(begin, end):
+            yield self.lengths[bucket], self.buckets[bucket]
+
+
+class TrigramIndex:
+    """
+    Character trigram inverted index over a list of strings, to find the strings that can reach a SequenceMatcher ratio
+    with a word without computing the ratio.
+
+    If SequenceMatcher matches M characters of two strings with summed length T, it does so in at most T - 2M + 1
+    blocks of equal substrings, and each block of length l contains l - 2 trigrams that both strings share. The strings
+    therefore share at least 5M - 2T - 2 trigrams, which is a bound that only prunes at high ratios.
+    """
+    def __init__(self, strings: List[str]):
+        """
+        :param strings: The strings to index
+        """
+        self.strings = list(strings)
+        self.postings = defaultdict(list)
+        self.length_buckets = LengthBuckets(self.strings)
+        for i, string in enumerate(self.strings):
+            for trigram, count in Counter(self.trigrams(string)).items():
+                self.postings[trigram].append((i, count))
+
+    @staticmethod
+    def trigrams(string: str):
+        return [string[i:i + 3] for i in range(len(string) - 2)]
+
+    def common_trigrams(self, word: str):
+        """
+        :param word: The word to look up
+        :return: A dictionary from the index of each string that shares trigrams with the word to the number of shared
+            trigrams, counted with multiplicity.
+        """
+        common = defaultdict(int)
+        for trigram, count in Counter(self.trigrams(word)).items():
+            for i, string_count in self.postings.get(trigram, ()):
+                common[i] += min(count, string_count)
+        return common
+
+    def candidates(self, word: str, cutoff: float, common: Dict[int, int] = None):
+        """
+        :param word: The word to look up
+        :param cutoff: The SequenceMatcher ratio to reach
+        :param common: The result of :meth:`common_trigrams` for the word, if already computed
+        :return: The indices of the strings that can have a ratio of at least cutoff with the word
+        """
+        if common is None:
+            common = self.common_trigrams(word)
+        candidates = []
+        for length, indices in self.length_buckets.visit(len(word), cutoff):
+            total_length = len(word) + length
+            min_common = 5 * ratio_cutoff_matches(total_length, cutoff) - 2 * total_length - 2
+            if min_common <= 0:
+                candidates += indices
+            else:
+                candidates += [i for i in indices if common.get(i, 0) >= min_common]
+        return candidates
 
 
 class FuzzyTreeMatcher(FuzzyMatcher):
@@ -78,15 +260,37 @@ class FuzzyTreeMatcher(FuzzyMatcher):
     Finds matches given a "tree", where a "tree" is a list of "searchables" grouped by a key element of the searchable.
     The key element is searched for first, after which different ordereings of the match are considered.
     """
+    # number of keys sharing the most trigrams with a word that are scored to raise the cutoff for the other keys
+    nr_seed_keys = 8
+
     def __init__(self, tree: Dict[str, Dict], cutoff_score: float):
         """
-        :param tree: The tree through which to search for entities, each key points to a list of "searchables"
-            containing that key as one of the elements.
+        :param tree: The tree through which to search for entities, each key points to the "searchables" containing
+            that key as one of the elements, with their precomputed permutations, see
+            :func:`create_tree <lib.ner_lists.fuzzy_permutative_finder.create_tree>`.
         :param cutoff_score: Score below which to disregard matches.
         """
         self.tree = tree
+        self.key_index = TrigramIndex(list(tree.keys()))
+        self.key_scorer = BatchScorer(self.key_index.strings)
         super().__init__(cutoff_score)
 
+    def score_key(self, word: str, cutoff_score: float):
+        """
+        :param word: A word of the sentence
+        :param cutoff_score: Score below which to disregard matches.
+        :return: The same as :meth:`score` of the word against all keys of the tree. Only the best key is needed, so the
+            keys that share most trigrams with the word are scored first, and their best ratio is used as cutoff to
+            select the other keys that can still score as high from the :class:`TrigramIndex`.
+        """
+        word_lower = word.lower()
+        common = self.key_index.common_trigrams(word_lower)
+        seeds = nlargest(self.nr_seed_keys, common, key=common.get)
+        seed_results = self.key_scorer.get_close_matches_scores(word_lower, 1, cutoff_score, seeds)
+        cutoff = max(cutoff_score, seed_results[0][0]) if seed_results else cutoff_score
+        candidates = set(self.key_index.candidates(word_lower, cutoff, common)).union(seeds)
+        return self.score_batch([word], self.key_scorer, cutoff_score, candidates)
+
     def find_matches(self, i_sentence: int, sentence: List[Dict], n_approx: int = 2):
         """
         :param i_sentence: An index of the sentence, used to match it to the correct place later on.
@@ -98,7 +302,7 @@ class FuzzyTreeMatcher(FuzzyMatcher):
         """
         first_word_cutoff_score = self.cutoff_score * (n_approx - 1) / n_approx
         for i, word in enumerate(sentence):
-            first_score, first_match = self.score([word], list(self.tree.keys()), first_word_cutoff_score)
+            first_score, first_match = self.score_key(word, first_word_cutoff_score)
             if first_score >= first_word_cutoff_score:
                 for entity in self.yield_matches(i_sentence, sentence, i, first_match):
                     yield entity
@@ -111,15 +315,15 @@ class FuzzyTreeMatcher(FuzzyMatcher):
         :param entity_key: The tree is essentially a large dictionary. entity_key is the key of the most likely entity
         :return: *Yields* entities as they are found
         """
-        for entity_words, canonicals in self.tree[entity_key].items():
+        for entity_words, entry in self.tree[entity_key].items():
             n = len(entity_words)
-            possibilities = list(''.join(perm) for perm in itertools.permutations(entity_words))
+            canonicals = entry['canonicals']
             for offset in range(0,  n):
                 i_offset = i - offset
                 if i_offset < 0:
                     continue
                 word_group = sentence[i_offset:i_offset + n]
-                score, match = self.score(word_group, possibilities)
+                score, match = self.score(word_group, entry['permutations'])
                 if match:
                     for canonical in canonicals:
                         yield Entity(sentence=i_sentence,
@@ -135,8 +339,9 @@ class FuzzyTreeMatcher(FuzzyMatcher):
 
 class FuzzyListMatcher(FuzzyMatcher):
     """
-    Finds matches given a "list", a list of "searchables" grouped by a key element of the searchable.
-    The key element is searched for first, after which different ordereings of the match are considered.
+    Finds matches given a "list", a list of "searchables" indexed by their first word.
+    The first word is searched for first, after which the searchables starting with the matched first words are
+    considered.
     """
     def __init__(self, fuzzy_list: Dict[str, Dict], cutoff_score: float):
         """
@@ -144,6 +349,13 @@ class FuzzyListMatcher(FuzzyMatcher):
         :param cutoff_score: Score below which to disregard matches.
         """
         self.fuzzy_list = fuzzy_list
+        self.searchables = list(fuzzy_list.keys())
+        # the indices of the searchables starting with each first word, in list order
+        self.first_word_index = defaultdict(list)
+        for index, searchable in enumerate(self.searchables):
+            self.first_word_index[searchable[0]].append(index)
+        self.first_words = LengthBuckets(sorted(self.first_word_index))
+        self.first_word_scorer = BatchScorer(self.first_words.strings)
         super().__init__(cutoff_score)
 
     def find_matches(self, i_sentence: int, sentence: List[Dict], n_approx: int = 2):
@@ -157,21 +369,28 @@ class FuzzyListMatcher(FuzzyMatcher):
         """
         first_word_cutoff_score = self.cutoff_score * (n_approx - 1) / n_approx
         for i, word in enumerate(sentence):
-            first_score, first_match = self.score(
-                [word], [searchable[0] for searchable in self.fuzzy_list.keys()], first_word_cutoff_score)
-            if first_score >= first_word_cutoff_score:
-                for entity in self.yield_matches(i_sentence, sentence, i):
+            candidates = [index for _, indices in self.first_words.visit(len(word), first_word_cutoff_score)
+                          for index in indices]
+            first_matches = self.first_word_scorer.get_close_matches_scores(
+                word.lower(), None, first_word_cutoff_score, candidates)
+            if first_matches:
+                searchables = sorted(index for _, first_word in first_matches
+                                     for index in self.first_word_index[first_word])
+                for entity in self.yield_matches(i_sentence, sentence, i, searchables):
                     yield entity
 
-    def yield_matches(self, i_sentence: int, sentence: List[Dict], i: int):
+    def yield_matches(self, i_sentence: int, sentence: List[Dict], i: int, searchables: List[int]):
         """
 
         :param i_sentence: string index
         :param sentence: list of words
-        :param i: index of word in sentence (which matches the key of an element in the tree-dictionary)
+        :param i: index of word in sentence (which matches the first word of the searchables)
+        :param searchables: indices of the searchables of which the first word matched
         """
 
-        for searchable, canonicals in self.fuzzy_list.items():
+        for index in searchables:
+            searchable = self.searchables[index]
+            canonicals = self.fuzzy_list[searchable]
             n = len(searchable)
             possibilities = [''.join(searchable)]
             word_group = sentence[i:i + n]
@@ -1,6 +1,10 @@
 from os import path as op
+import bisect
+import copy
+import itertools
 import logging
-from typing import List, Dict
+import math
+from typing import List, Dict, Tuple
 
 from lib import constants
 from lib.ner_lists.entity import Entity
@@ -9,50 +13,79 @@ from lib.ner_lists.fuzzy_matcher import FuzzyTreeMatcher
 
 LOGGER = logging.getLogger(__name__)
 
+# the number of orderings of a searchable grows factorially with its number of words, at most this many are kept
+MAX_PERMUTATIONS = 5040
+
 
 class FuzzyPermutativeFinder(Finder):
     """
     Finds entities from lists where the searchable forms *are* to be permuted *and* to be matched fuzzily.
     An object is instantiated for each different type of entity in the project, e.g. person, location and date.
     """
-    def __init__(self, data_dir: str, entity_type: str, word_getter: str, cutoff_score: float):
+    def __init__(self, data_dir: str, entity_type: str, word_getter: str, cutoff_score: float,
+                 overlap_resolution: str = 'optimal'):
         """
         :param data_dir: Path to the data files to use relative to the pipeline_data director, e.g. "ner_lists/SZSA".
         :param entity_type: See :class:`Finder`
         :param word_getter: See :class:`Finder`
         :param cutoff_score: The lowest score for entities to still be considered a hit.
+        :param overlap_resolution: How to choose between overlapping entities, see :func:`remove_overlap`.
         """
         filepath = op.join(constants.DATA_DIR, data_dir, 'fuzzy_permutative', entity_type)
 
-        all_lists = self.create_lists(filepath)
-
-        searchable_trees = {name: create_tree(all_list) for name, all_list in all_lists.items()}
-        if not searchable_trees:
+        entity_finders = self.load_entity_finders(
+            filepath, cutoff_score=cutoff_score, overlap_resolution=overlap_resolution)
+        if not entity_finders:
             LOGGER.info(f"Cannot create fuzzy_permutative for {filepath}, probably missing txt-files")
-        entity_finders = {
-            name: FindEntitiesGivenTree(searchable_tree, cutoff_score=cutoff_score)
-            for name, searchable_tree in searchable_trees.items()
-        }
         super().__init__(entity_type, entity_finders, word_getter)
 
+    @classmethod
+    def build_entity_finder(cls, all_list: Dict, cutoff_score: float, overlap_resolution: str):
+        """
+        :param all_list: A list, as returned by :func:`load_file <lib.ner_lists.finder.load_file>`
+        :param cutoff_score: The lowest score for entities to still be considered a hit.
+        :param overlap_resolution: How to choose between overlapping entities, see :func:`remove_overlap`.
+        :return: A tree finder for the list
+        """
+        return FindEntitiesGivenTree(create_tree(all_list), cutoff_score=cutoff_score,
+                                     overlap_resolution=overlap_resolution)
+
 
-def create_tree(all_list: Dict) -> Dict[str, Dict]:
+def create_tree(all_list: Dict, max_permutations: int = MAX_PERMUTATIONS) -> Dict[str, Dict]:
     """
     :param all_list: A dictionary of searchable-canonical pairs
-    :return: A dictionary where the keys are the first word that would be searched, the values are nested dicts of the
-        same form as the input, i.e. searchable-canonical pairs.
+    :param max_permutations: The maximal number of orderings of a searchable that is matched, see
+        :func:`create_permutations`.
+    :return: A dictionary where the keys are the first word that would be searched, the values are nested dicts from
+        each searchable to its "permutations", the concatenated orderings of its words, and its "canonicals".
     """
     freq_table = create_freq_table(all_list)
     tree = {}
+    nr_capped = 0
     for searchable, canonical in all_list.items():
         ordered = sorted(searchable, key=lambda x: freq_table[x], reverse=False)
         key_word = ordered[0]
         key_list = tree.get(key_word, {})
-        key_list[searchable] = canonical
+        nr_capped += math.factorial(len(searchable)) > max_permutations
+        key_list[searchable] = {'permutations': create_permutations(searchable, max_permutations),
+                                'canonicals': canonical}
         tree[key_word] = key_list
+    if nr_capped:
+        LOGGER.warning(f"Matching only {max_permutations} orderings of {nr_capped} searchables with many words")
     return tree
 
 
+def create_permutations(searchable: Tuple[str, ...], max_permutations: int = MAX_PERMUTATIONS) -> List[str]:
+    """
+    :param searchable: The words of a searchable
+    :param max_permutations: The maximal number of orderings to return
+    :return: The distinct concatenations of the words in all orders, starting with the order of the searchable. Only the
+        first max_permutations orderings are generated, which keep the first words in place the longest.
+    """
+    permutations = itertools.islice(itertools.permutations(searchable), max_permutations)
+    return list(dict.fromkeys(''.join(permutation) for permutation in permutations))
+
+
 def create_freq_table(all_list: Dict):
     """
     :param all_list: A dictionary of searchable-canonical pairs.
@@ -66,24 +99,80 @@ def create_freq_table(all_list: Dict):
 
 
 class FindEntitiesGivenTree(FindEntities):
-    def __init__(self, tree, cutoff_score):
+    def __init__(self, tree, cutoff_score, overlap_resolution: str = 'optimal'):
         """
-        :param tree: The list to search, given by a dictionary where the keys are the searchables and the values
-            represent the (canonical) information on each entity.
+        :param tree: The list to search, as created by :func:`create_tree`.
         :param cutoff_score: The lowest score for entities to still be considered a hit.
+        :param overlap_resolution: How to choose between overlapping entities, see :func:`remove_overlap`.
         """
         self.tm = FuzzyTreeMatcher(tree, cutoff_score)
+        self.overlap_resolution = overlap_resolution
         super().__init__()
 
     def __call__(self, i_sentence, sentence) -> List[Entity]:
         entities = list(self.tm.find_matches(i_sentence, sentence))
         # delete overlapping entities
-        final_entities = remove_overlap(entities, len(sentence))
+        final_entities = remove_overlap(entities, len(sentence), self.overlap_resolution)
         return final_entities
 
+    def with_parameters(self, cutoff_score: float, overlap_resolution: str):
+        other = copy.copy(self)
+        other.tm = copy.copy(self.tm)
+        other.tm.cutoff_score = cutoff_score
+        other.overlap_resolution = overlap_resolution
+        return other
 
-def remove_overlap(entities: List[Entity], sentence_length: int) -> List[Entity]:
+
+def remove_overlap(entities: List[Entity], sentence_length: int, overlap_resolution: str = 'optimal') -> List[Entity]:
     """
+    :param entities: The found entities by the permutative searching.
+    :param sentence_length: The length of the sentence in which the entities occur.
+    :param overlap_resolution: How to choose between overlapping entities, see OVERLAP_RESOLUTIONS.
+    :return: A trimmed list of found entities where overlapping results are discarded.
+    """
+    if overlap_resolution not in OVERLAP_RESOLUTIONS:
+        raise ValueError(f"Unknown overlap_resolution {overlap_resolution}, pick one of {list(OVERLAP_RESOLUTIONS)}")
+    return OVERLAP_RESOLUTIONS[overlap_resolution](entities, sentence_length)
+
+
+def remove_overlap_optimal(entities: List[Entity], sentence_length: int) -> List[Entity]:
+    """
+    Weighted interval scheduling: of all sets of entities that do not overlap, the one with the highest total score is
+    kept. Of sets with the same total score the one with the earliest ending entities is kept, and of entities with the
+    same span and score the first one found.
+
+    :param entities: The found entities by the permutative searching.
+    :param sentence_length: The length of the sentence in which the entities occur.
+    :return: The non-overlapping entities with the highest total score, in the order in which they were found.
+    """
+    order = sorted(range(len(entities)), key=lambda i: (entities[i].end, i))
+    ends = [entities[i].end for i in order]
+    # best[j] is the highest total score of the first j entities in order of their end, chosen[j] whether the j-th is
+    # part of it and previous[j] the number of entities that end before the j-th begins
+    best = [0.] * (len(order) + 1)
+    chosen = [False] * len(order)
+    previous = [0] * len(order)
+    for j, i in enumerate(order):
+        previous[j] = bisect.bisect_right(ends, entities[i].begin, 0, j)
+        with_entity = entities[i].score + best[previous[j]]
+        chosen[j] = with_entity > best[j]
+        best[j + 1] = with_entity if chosen[j] else best[j]
+    kept = []
+    j = len(order)
+    while j > 0:
+        if chosen[j - 1]:
+            kept.append(order[j - 1])
+            j = previous[j - 1]
+        else:
+            j -= 1
+    return [entities[i] for i in sorted(kept)]
+
+
+def remove_overlap_greedy(entities: List[Entity], sentence_length: int) -> List[Entity]:
+    """
+    Goes through the entities in the order in which they were found and replaces overlapping entities by a new one if it
+    has a higher score than each of them, so the result depends on the order of the entities.
+
     :param entities: The found entities by the permutative searching.
     :param sentence_length: The length of the sentence in which the entities occur.
     :return: A trimmed list of found entities where overlapping results are discarded.
@@ -111,3 +200,9 @@ def remove_overlap(entities: List[Entity], sentence_length: int) -> List[Entity]
     for i in list(set(base) - {0}):
         final_matches.append(entities[i - 1])
     return final_matches
+
+
+OVERLAP_RESOLUTIONS = {
+    'optimal': remove_overlap_optimal,
+    'greedy': remove_overlap_greedy,
+}
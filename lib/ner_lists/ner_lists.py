@@ -10,7 +10,8 @@ class NerLists:
     """
     Find entities by comparing words with lists
     """
-    def __init__(self, data_dir: Union[List[str], str], word_getter: str, cutoff_score: float, entity_types: List[str]):
+    def __init__(self, data_dir: Union[List[str], str], word_getter: str, cutoff_score: float, entity_types: List[str],
+                 overlap_resolution: str = 'optimal'):
         """
         :param data_dir: Path of the lists, given as either a string or a list of strings, is processed using
             `os.path.join`.
@@ -18,15 +19,17 @@ class NerLists:
             "BERT" are supported.
         :param cutoff_score: The cut-off score below which matches will not be returned.
         :param entity_types: Which entity types to search for, e.g. `["person", "location"]`.
+        :param overlap_resolution: How the fuzzy finders choose between overlapping entities: "optimal" keeps the
+            non-overlapping entities with the highest total score, "greedy" the previous order-dependent selection.
         """
         self.fuzzy_permutative_finders = {
             entity_type: FuzzyPermutativeFinder(
-                op.join(*data_dir), entity_type, word_getter, cutoff_score)
+                op.join(*data_dir), entity_type, word_getter, cutoff_score, overlap_resolution)
             for entity_type in entity_types
         }
         self.fuzzy_finders = {
             entity_type: FuzzyFinder(
-                op.join(*data_dir), entity_type, word_getter, cutoff_score)
+                op.join(*data_dir), entity_type, word_getter, cutoff_score, overlap_resolution)
             for entity_type in entity_types
         }
         self.direct_finders = {
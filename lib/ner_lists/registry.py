@@ -0,0 +1,150 @@
+"""
+Registry of the compiled entity finders of all lists loaded in the process. Finders are keyed by the type of finder and
+the sha256 of the contents of the list file, so a list that occurs in several data directories, e.g. forten.txt in both
+NA and SZSA, is parsed, compiled and kept in memory once, also when a server hosts several configs. A finder that is
+needed with other parameters, e.g. another cutoff_score, is a shallow copy sharing the compiled list.
+
+The resident size of each list can be printed with
+
+.. code-block:: bash
+
+    python -m lib.ner_lists.registry --configfiles server/config_NA.json server/config_SZSA.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ListRegistry:
+    """
+    Maps (finder type, content hash) to the entity finders of a list for each set of parameters, and the paths of the
+    lists they were used for.
+    """
+    def __init__(self):
+        self.entries: Dict[tuple, Dict] = {}
+
+    @staticmethod
+    def key(kind: str, path: str):
+        """
+        :param kind: The type of finder, e.g. "FuzzyPermutativeFinder"
+        :param path: Path of the list file
+        :return: The key of the compiled list in the registry
+        """
+        with open(path, 'rb') as f:
+            return kind, hashlib.sha256(f.read()).hexdigest()
+
+    @staticmethod
+    def _parameters_key(parameters: Dict):
+        return tuple(sorted(parameters.items()))
+
+    def get(self, key: tuple, path: str, parameters: Dict):
+        """
+        :param key: The key from :meth:`key`
+        :param path: Path of the list file the finder is needed for
+        :param parameters: The parameters the finder is needed with
+        :return: The registered entity finder, derived from one with other parameters if needed, or None if the list
+            has not been compiled yet
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if path not in entry['paths']:
+            LOGGER.info(f"Sharing the compiled list {entry['paths'][0]} for {path}")
+            entry['paths'].append(path)
+        finders = entry['entity_finders']
+        parameters_key = self._parameters_key(parameters)
+        if parameters_key not in finders:
+            finders[parameters_key] = next(iter(finders.values())).with_parameters(**parameters)
+        return finders[parameters_key]
+
+    def add(self, key: tuple, entity_finder, path: str, parameters: Dict):
+        """
+        :param key: The key from :meth:`key`
+        :param entity_finder: The compiled entity finder of the list
+        :param path: Path of the list file
+        :param parameters: The parameters the finder is built with
+        :return: The entity finder
+        """
+        self.entries[key] = {'entity_finders': {self._parameters_key(parameters): entity_finder}, 'paths': [path]}
+        return entity_finder
+
+    def clear(self):
+        self.entries.clear()
+
+    def report(self) -> List[Dict]:
+        """
+        :return: For each compiled list the finder type, the paths of the list files it is used for and its resident
+            size in bytes, which includes the finders for all parameters. Objects shared between lists are counted for
+            each of them.
+        """
+        return [
+            {'kind': key[0], 'paths': entry['paths'], 'resident_size': deep_getsizeof(entry['entity_finders'])}
+            for key, entry in self.entries.items()
+        ]
+
+
+def deep_getsizeof(obj, seen: Optional[set] = None):
+    """
+    :param obj: Any object
+    :param seen: The ids of objects that have already been counted
+    :return: The size in bytes of the object and all objects it refers to through containers, instance dictionaries
+        and slots, including the data of numpy arrays.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            # an array that owns its data includes it in its size, a view refers to the array that owns it
+            size += sys.getsizeof(obj)
+            if obj.base is not None:
+                stack.append(obj.base)
+            continue
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, bool)) and obj is not None:
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return size
+
+
+REGISTRY = ListRegistry()
+
+
+if __name__ == "__main__":
+    from lib.ner_lists.ner_lists import NerLists
+    # the finders register their lists in the imported module, not in __main__
+    from lib.ner_lists.registry import REGISTRY
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Load the lists of one or more configs and print their resident size')
+    parser.add_argument('--configfiles', type=str, nargs='+', required=True)
+    args = parser.parse_args()
+    ner_lists = []
+    for configfile in args.configfiles:
+        with open(configfile) as f:
+            ner_lists.append(NerLists(**json.load(f)['ner_lists']))
+    total_size = 0
+    for entry in sorted(REGISTRY.report(), key=lambda entry: entry['resident_size'], reverse=True):
+        total_size += entry['resident_size']
+        print(f"{entry['resident_size'] / 2 ** 20:8.2f} MiB  {entry['kind']:24}  {', '.join(entry['paths'])}")
+    print(f"{total_size / 2 ** 20:8.2f} MiB  total for {len(REGISTRY.entries)} lists")
@@ -1,5 +1,7 @@
 import logging
-from typing import Dict, Tuple, List, Union
+from typing import Dict, Tuple, List, Union, Mapping
+
+from lib.document import Document, from_json
 
 
 class Pipeline:
@@ -45,7 +47,7 @@ class Pipeline:
         )
         logging.info(f"Initialized pipeline with steps {self.possible_steps}")
 
-    def __call__(self, input_data: Union[str, List[List[Dict]]], steps: Tuple[str, ...] = None):
+    def __call__(self, input_data: Union[str, List[List[Mapping]]], steps: Tuple[str, ...] = None):
         """
         :param input_data: Either a string of historical Dutch text, if the step "string_to_sentences" is involved,
             or a dictionary corresponding to the :download:`json schema </../../lib/format.schema.json>` if it is not.
@@ -86,7 +88,8 @@ class Pipeline:
                found by BERT. For such a project, e.g. SZSA, the BERT step is a prerequisite for the lists step.
             .. [3] The modernisation is configured to leave certain found entities unchanged. This is only possible if
         :param steps: Which steps to execute within this call to the pipelines
-        :return: Dict with a format according to `lib.schema (format.schema.json)` Depending on which parts of the
+        :return: List of sentences of :class:`Word <lib.document.Word>`, which are converted to the format according to
+            `lib.schema (format.schema.json)` by :func:`to_json <lib.document.to_json>`. Depending on which parts of the
             pipeline are called, the required input and expected output will be different.
         """
         steps = steps if steps is not None else self.possible_steps
@@ -97,11 +100,11 @@ class Pipeline:
             assert isinstance(input_data, str)
             obj = self.string_to_sentences(input_data)
         else:
-            obj = input_data
             # if post_correction step is not required, the input_data must be a list of list of dicts
-            assert isinstance(obj, list)
-            assert all(isinstance(s, list) for s in obj)
-            assert all(isinstance(w, dict) for s in obj for w in s)
+            assert isinstance(input_data, list)
+            assert all(isinstance(s, list) for s in input_data)
+            assert all(isinstance(w, Mapping) for s in input_data for w in s)
+            obj = from_json(input_data)
         if 'post_correction' in steps:
             logging.info('Doing post_correction')
             obj = self.post_correction(obj)
@@ -115,7 +118,7 @@ class Pipeline:
             logging.info('Doing modernisation')
             obj = self.modernisation(obj)
 
-        return obj
+        return Document(obj)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,27 @@
+import argparse
 import logging
+import os
 import os.path as op
 import re
+import time
 
 import lib.post_correction.spellchecker_local as spellchecker
+from lib.post_correction.mapped_table import MappedTable, write_table
+from lib.post_correction.lru_cache import LRUCache
 
 from lib import constants
 LOGGER = logging.getLogger(__name__)
 
 
+ENGINES = {
+    'norvig': spellchecker.SpellChecker,
+    'symmetric_delete': spellchecker.SymmetricDeleteSpellChecker,
+}
+
 TABLES = {
     'post_correction': {
         'file': 'tag_de_tekst_dict_for_pyspellchecker.json.gz',
+        'mapped_file': 'tag_de_tekst_dict_for_pyspellchecker.table',
         'threshold': 15,
         'min_length': 4,
     },
@@ -22,19 +33,28 @@ class FreqTableCleanUp:
     Loads a pyspellchecker dictionary and clean up words with this dict. Current implementation is only used for fixing
     transcription errors in the input. Using it to also improve modernisation of words has proven ineffective.
     """
-    def __init__(self, table_name: str):
+    def __init__(self, table_name: str, engine: str = 'norvig', cache_size: int = 100000, cache_path: str = None,
+                 cache_save_interval: float = 300.):
         """
         :param table_name: Name of frequency table to use. Currently only post_correction is available.
         :type table_name: str
+        :param engine: Spellchecker to use, see ENGINES. "norvig" generates all edits of a word for each correction,
+            "symmetric_delete" looks up candidates in an index that is built once and gives the same corrections.
+        :type engine: str
+        :param cache_size: Maximum number of word parts of which the correction is kept in an LRU cache, 0 disables the
+            cache.
+        :type cache_size: int
+        :param cache_path: If given, the cached word parts and their corrections are loaded from this json file at
+            initialization, and merged into it by :meth:`save_cache`, so a restarted process does not start with an
+            empty cache. Processes can share the file. It is ignored when the frequency table has changed.
+        :type cache_path: str
+        :param cache_save_interval: Minimal number of seconds between two saves by :meth:`maybe_save_cache`.
+        :type cache_save_interval: float
         """
         self.word_part_split_pattern = re.compile('([ :;.,])')
 
         LOGGER.info(f"Initializing spellchecker for {table_name}")
         table = TABLES[table_name]
-        local_dict_path = op.join(constants.DATA_DIR, 'post_correction', table['file'])
-        self.spell = spellchecker.SpellChecker(distance=1, case_sensitive=False, local_dictionary=local_dict_path)
-        if self.spell.word_frequency.total_words == 0:
-            LOGGER.error(f"Cannot initialize frequency table, probably missing file {local_dict_path}")
         """
         LD=1 and threshold=15 for cut-off can be adapted, set to 1 for now.
         Input should be a word.
@@ -42,8 +62,74 @@ class FreqTableCleanUp:
         self.threshold = table['threshold']
         self.min_length = table['min_length']
 
-        if self.threshold:
-            self.spell.word_frequency.remove_by_threshold(threshold=self.threshold)
+        local_dict_path = op.join(constants.DATA_DIR, 'post_correction', table['file'])
+        mapped_path = op.join(constants.DATA_DIR, 'post_correction', table['mapped_file'])
+        mapped_table = self.open_mapped_table(table_name)
+        # the corrections in a saved cache are only valid for the frequency table they were computed with
+        table_path = local_dict_path if op.exists(local_dict_path) else mapped_path
+        table_mtime = op.getmtime(table_path) if op.exists(table_path) else None
+        self.table_version = f"{op.basename(table_path)}:{table_mtime}:{self.threshold}"
+        if mapped_table is not None:
+            # the mapped table has already been thresholded
+            self.spell = ENGINES[engine](distance=1, case_sensitive=False, table=mapped_table)
+        else:
+            self.spell = ENGINES[engine](distance=1, case_sensitive=False, local_dictionary=local_dict_path)
+            if self.spell.word_frequency.total_words == 0:
+                LOGGER.error(f"Cannot initialize frequency table, probably missing file {local_dict_path}")
+            if self.threshold:
+                self.spell.word_frequency.remove_by_threshold(threshold=self.threshold)
+        if isinstance(self.spell, spellchecker.SymmetricDeleteSpellChecker):
+            self.spell.build_index()
+
+        self.cache = LRUCache(self.spell.correction, cache_size)
+        self.cache_path = cache_path
+        self.cache_save_interval = cache_save_interval
+        self.last_cache_save = time.monotonic()
+        if cache_path is not None and op.exists(cache_path):
+            nr_loaded = self.cache.load(cache_path, self.table_version)
+            LOGGER.info(f"Loaded {nr_loaded} word parts into the correction cache from {cache_path}")
+
+    @staticmethod
+    def open_mapped_table(table_name: str):
+        """
+        :param table_name: Name of the frequency table
+        :return: The memory-mapped table built by :meth:`build_mapped_table`, or None if it does not exist or is older
+            than the json dictionary or was built with another threshold.
+        """
+        table = TABLES[table_name]
+        local_dict_path = op.join(constants.DATA_DIR, 'post_correction', table['file'])
+        mapped_path = op.join(constants.DATA_DIR, 'post_correction', table['mapped_file'])
+        if not op.exists(mapped_path):
+            return None
+        if op.exists(local_dict_path) and op.getmtime(local_dict_path) > op.getmtime(mapped_path):
+            LOGGER.warning(f"Ignoring {mapped_path}, it is older than {local_dict_path}")
+            return None
+        mapped_table = MappedTable(mapped_path)
+        if mapped_table.threshold != table['threshold']:
+            LOGGER.warning(f"Ignoring {mapped_path}, it was built with threshold {mapped_table.threshold}")
+            return None
+        return mapped_table
+
+    @staticmethod
+    def build_mapped_table(table_name: str):
+        """
+        Writes the thresholded frequency table and the start and end sets of the spellchecker to a file that is
+        memory-mapped by all processes, see :mod:`lib.post_correction.mapped_table`.
+        :param table_name: Name of the frequency table
+        :return: The path of the table file
+        """
+        table = TABLES[table_name]
+        local_dict_path = op.join(constants.DATA_DIR, 'post_correction', table['file'])
+        mapped_path = op.join(constants.DATA_DIR, 'post_correction', table['mapped_file'])
+        spell = spellchecker.SpellChecker(distance=1, case_sensitive=False, local_dictionary=local_dict_path)
+        if table['threshold']:
+            spell.word_frequency.remove_by_threshold(threshold=table['threshold'])
+        # write to a temporary file first, so processes that are starting never open a partially written table
+        write_table(mapped_path + '.tmp', spell.word_frequency.dictionary, spell._start_set, spell._end_set,
+                    spell._start_length, table['threshold'])
+        os.replace(mapped_path + '.tmp', mapped_path)
+        LOGGER.info(f"Wrote frequency table {table_name} to {mapped_path}")
+        return mapped_path
 
     def __call__(self, word_form: str):
         """
@@ -56,6 +142,31 @@ class FreqTableCleanUp:
 
     def _per_part(self, word_part: str):
         if len(word_part) > 4 and not word_part[0].isupper():
-            return self.spell.correction(word_part)
+            return self.cache(word_part)
         else:
             return word_part
+
+    def save_cache(self):
+        """
+        Saves the cached word parts to the cache_path, if given, and logs the counters of the cache.
+        """
+        self.last_cache_save = time.monotonic()
+        LOGGER.info(f"Correction cache: {self.cache.info()}")
+        if self.cache_path is not None:
+            self.cache.save(self.cache_path, self.table_version)
+
+    def maybe_save_cache(self):
+        """
+        Calls :meth:`save_cache` if the last save was at least cache_save_interval seconds ago.
+        """
+        if time.monotonic() - self.last_cache_save >= self.cache_save_interval:
+            self.save_cache()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Build the memory-mapped frequency tables used by the post-correction')
+    parser.add_argument('--tables', type=str, nargs='+', default=list(TABLES))
+    args = parser.parse_args()
+    for name in args.tables:
+        FreqTableCleanUp.build_mapped_table(name)
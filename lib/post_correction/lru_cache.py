@@ -0,0 +1,127 @@
+"""
+A bounded least-recently-used cache with counters to size it, and the option to persist its entries.
+"""
+import fcntl
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Maps keys to the values computed by a function, keeping at most max_size of them. When the cache is full, the least
+    recently used key is evicted.
+    """
+    def __init__(self, function: Callable, max_size: int):
+        """
+        :param function: The function of which the results are cached, called with a single key
+        :param max_size: The maximum number of cached keys, 0 disables the cache
+        """
+        self.function = function
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, key: Hashable):
+        """
+        :param key: The argument of the function
+        :return: The value of the function for the key, from the cache if possible
+        """
+        try:
+            value = self.values[key]
+        except KeyError:
+            self.misses += 1
+            value = self.function(key)
+            if self.max_size > 0:
+                self.values[key] = value
+                if len(self.values) > self.max_size:
+                    self.values.popitem(last=False)
+                    self.evictions += 1
+        else:
+            self.hits += 1
+            self.values.move_to_end(key)
+        return value
+
+    def info(self):
+        """
+        :return: A dictionary with the counters and the size of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.,
+            'size': len(self.values),
+            'max_size': self.max_size,
+        }
+
+    def save(self, path: str, version: str = None):
+        """
+        Writes the cached keys and values to a json file, together with the version of the function. The entries that
+        are already in the file for the same version are merged in first, so processes that share the file add to each
+        other's entries instead of overwriting them. The entries of this cache count as the most recently used.
+        :param path: The json file to write
+        :param version: Identifies the function that computed the values, e.g. the modification time of a frequency
+            table, a file with another version is overwritten
+        """
+        # lock the directory of the file against other processes merging into it at the same time, a lock file next to
+        # the cache would be left behind
+        lock = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            items = OrderedDict(self._read(path, version) or [])
+            for key, value in self.values.items():
+                items.pop(key, None)
+                items[key] = value
+            items = list(items.items())[-self.max_size:] if self.max_size > 0 else []
+            # write to a temporary file first, so other processes never load a partially written file
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': version, 'items': items}, f)
+            os.replace(tmp_path, path)
+        finally:
+            os.close(lock)
+
+    def load(self, path: str, version: str = None):
+        """
+        Fills the cache with the keys and values saved by :meth:`save`, without calling the function. The file is
+        ignored if it was saved for another version. Loading does not count as hits or misses.
+        :param path: The json file to read
+        :param version: Identifies the function that computed the values, see :meth:`save`
+        :return: The number of keys loaded
+        """
+        items = self._read(path, version)
+        if items is None:
+            return 0
+        items = items[-self.max_size:] if self.max_size > 0 else []
+        for key, value in items:
+            self.values[key] = value
+        return len(items)
+
+    @staticmethod
+    def _read(path: str, version: str):
+        """
+        :return: The [key, value] pairs saved in the file, or None if it does not exist, cannot be read or was saved for
+            another version
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                saved: Dict = json.load(f)
+            items: List = saved['items']
+            saved_version = saved['version']
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            LOGGER.warning(f'Could not load the cache from {path}: {e}')
+            return None
+        if saved_version != version:
+            LOGGER.info(f'Ignoring the cache in {path}, it was saved for version {saved_version} instead of {version}')
+            return None
+        return items
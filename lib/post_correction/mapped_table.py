@@ -0,0 +1,217 @@
+"""
+A compact, read-only file format for the frequency tables of the post-correction. The words, their counts and the
+start/end sets of :class:`SpellChecker <lib.post_correction.spellchecker_local.SpellChecker>` are stored as sorted
+UTF-8 strings, which are memory-mapped and looked up in place. All processes that open the same file therefore share it
+through the page cache and opening it takes milliseconds, instead of each process parsing and thresholding the json
+dictionary.
+
+Layout of the file: the magic bytes, the length of the header, the header as json and then the sections, each aligned
+to 8 bytes. A section of n strings consists of n + 1 int64 offsets, an open-addressing hash table of int32 slots that
+refer to the strings by their index + 1, and the concatenated UTF-8 encoded strings. The spellchecker does many lookups
+per word, so these are hashed (crc32, linear probing) rather than binary searched.
+"""
+import json
+import mmap
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Dict, Iterable
+
+MAGIC = b'IJSBFT01'
+ALIGNMENT = 8
+
+
+def _nr_slots(count: int):
+    """
+    :return: The number of hash slots for count strings, a power of two that keeps the load factor at most 0.5
+    """
+    nr_slots = 2
+    while nr_slots < 2 * count:
+        nr_slots *= 2
+    return nr_slots
+
+
+class MappedStrings:
+    """
+    Sorted strings in a memory-mapped section, supporting `in` by hashing.
+    """
+    def __init__(self, buffer: mmap.mmap, position: int, count: int):
+        """
+        :param buffer: The memory-mapped file
+        :param position: The position of the section in the file
+        :param count: The number of strings in the section
+        """
+        self.buffer = buffer
+        self.count = count
+        self.mask = _nr_slots(count) - 1
+        slots_position = position + 8 * (count + 1)
+        self.offsets = memoryview(buffer)[position:slots_position].cast('q')
+        self.blob = slots_position + 4 * (self.mask + 1)
+        self.slots = memoryview(buffer)[slots_position:self.blob].cast('i')
+
+    def _bytes(self, i: int):
+        return self.buffer[self.blob + self.offsets[i]:self.blob + self.offsets[i + 1]]
+
+    def index(self, string: str):
+        """
+        :return: The index of the string, or -1 if it is not present
+        """
+        key = string.encode('utf-8')
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            i = self.slots[slot] - 1
+            if i < 0:
+                return -1
+            if self._bytes(i) == key:
+                return i
+            slot = (slot + 1) & self.mask
+
+    def __contains__(self, string):
+        return isinstance(string, str) and self.index(string) >= 0
+
+    def __getitem__(self, i: int):
+        return self._bytes(i).decode('utf-8')
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+
+class MappedWordFrequency(Mapping):
+    """
+    A read-only replacement of the WordFrequency of pyspellchecker. As a Counter, it gives 0 for unknown words. It is its
+    own dictionary.
+    """
+    def __init__(self, words: MappedStrings, counts: memoryview, header: Dict):
+        self.words = words
+        self.counts = counts
+        self._total_words = header['total_words']
+        self._longest_word_length = header['longest_word_length']
+        self._letters = set(header['letters'])
+
+    def __getitem__(self, word):
+        i = self.words.index(word) if isinstance(word, str) else -1
+        return self.counts[i] if i >= 0 else 0
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def dictionary(self):
+        return self
+
+    @property
+    def total_words(self):
+        return self._total_words
+
+    @property
+    def unique_words(self):
+        return len(self.words)
+
+    @property
+    def longest_word_length(self):
+        return self._longest_word_length
+
+    @property
+    def letters(self):
+        return self._letters
+
+
+class MappedTable:
+    """
+    A frequency table file opened read-only, see :func:`write_table`.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: Path of the table file
+        """
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a frequency table file')
+        header_length, = struct.unpack_from('<q', self.buffer, len(MAGIC))
+        header_position = len(MAGIC) + 8
+        self.header = json.loads(self.buffer[header_position:header_position + header_length].decode('utf-8'))
+        sections = self.header['sections']
+
+        words = MappedStrings(self.buffer, sections['words']['position'], sections['words']['count'])
+        counts_position = sections['counts']['position']
+        counts = memoryview(self.buffer)[counts_position:counts_position + 8 * len(words)].cast('q')
+        self.word_frequency = MappedWordFrequency(words, counts, self.header)
+        self.start_set = MappedStrings(self.buffer, sections['start_set']['position'], sections['start_set']['count'])
+        self.end_set = MappedStrings(self.buffer, sections['end_set']['position'], sections['end_set']['count'])
+        self.start_length = self.header['start_length']
+        self.threshold = self.header['threshold']
+
+
+def _strings_section(strings: Iterable[str]):
+    # UTF-8 preserves the order of code points, so the bytes are sorted as the strings
+    encoded = sorted(string.encode('utf-8') for string in strings)
+    offsets = [0]
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    mask = _nr_slots(len(encoded)) - 1
+    slots = [0] * (mask + 1)
+    for i, string in enumerate(encoded):
+        slot = zlib.crc32(string) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = i + 1
+    return len(encoded), (struct.pack(f'<{len(offsets)}q', *offsets) + struct.pack(f'<{len(slots)}i', *slots)
+                          + b''.join(encoded))
+
+
+def _pad(data: bytes):
+    return data + b'\0' * (-len(data) % ALIGNMENT)
+
+
+def write_table(path: str, dictionary: Dict[str, int], start_set: Iterable[str], end_set: Iterable[str],
+                start_length: int, threshold: int):
+    """
+    Writes a frequency table that can be opened by :class:`MappedTable`.
+    :param path: Path of the table file
+    :param dictionary: The words and their counts, after thresholding
+    :param start_set: The start set of the SpellChecker
+    :param end_set: The end set of the SpellChecker
+    :param start_length: The length of the longest strings in the start and end sets
+    :param threshold: The threshold that has been applied to the dictionary
+    """
+    words = sorted(dictionary, key=lambda word: word.encode('utf-8'))
+    nr_words, words_section = _strings_section(words)
+    sections = {
+        'words': (nr_words, words_section),
+        'counts': (nr_words, struct.pack(f'<{nr_words}q', *(dictionary[word] for word in words))),
+        'start_set': _strings_section(start_set),
+        'end_set': _strings_section(end_set),
+    }
+    header = {
+        'start_length': start_length,
+        'threshold': threshold,
+        'total_words': sum(dictionary.values()),
+        'longest_word_length': max((len(word) for word in words), default=0),
+        'letters': ''.join(sorted(set(letter for word in words for letter in word))),
+        'sections': {}
+    }
+    # the header contains the positions of the sections, which depend on the length of the header, so the positions are
+    # computed with a header that is long enough
+    placeholder_length = len(json.dumps(header)) + 64 * len(sections)
+    position = len(MAGIC) + 8 + placeholder_length + (-placeholder_length % ALIGNMENT)
+    for name, (count, data) in sections.items():
+        header['sections'][name] = {'position': position, 'count': count}
+        position += len(_pad(data))
+    header_bytes = json.dumps(header).encode('utf-8').ljust(placeholder_length + (-placeholder_length % ALIGNMENT))
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<q', len(header_bytes)))
+        f.write(header_bytes)
+        for count, data in sections.values():
+            f.write(_pad(data))
@@ -13,23 +13,32 @@ class PostCorrection:
     """
     Responible for the correction of mistakes by the Handwritten Text Recognition (HTR) input.
     """
-    def __init__(self, **_):
+    def __init__(self, engine: str = 'norvig', cache_size: int = 100000, cache_path: str = None, **_):
         """
         Initializes the class' :class:`FreqTableCleanUp <lib.post_correct.freq_table_cleanup.FreqTableCleanUp>` object
+        :param engine: The spellchecker engine used by the FreqTableCleanUp, "norvig" or "symmetric_delete".
+        :param cache_size: Size of the LRU cache of corrections of the FreqTableCleanUp, 0 disables it.
+        :param cache_path: File to which the cached word parts are saved periodically and from which they are loaded at
+            initialization.
         :param _: Unused kwarg argument, included for symmetry with the other pipeline steps.
         """
-        self.freq_table_clean_up = FreqTableCleanUp('post_correction')
+        self.freq_table_clean_up = FreqTableCleanUp('post_correction', engine=engine, cache_size=cache_size,
+                                                    cache_path=cache_path)
 
     def __call__(self, sentences: List[List[Dict]]):
         """
         :param sentences: List of lists of words
         :return:  The sentences where each word has been provided with a "post_correction" key containing the corrected
-            form of the word.
+            form of the word. Each unique word form is corrected once and the result is copied to all its occurrences.
         """
-
+        corrections = {}
         for sentence in sentences:
             for word in sentence:
-                word['post_correction'] = self.freq_table_clean_up(word['word'])
+                word_form = word['word']
+                if word_form not in corrections:
+                    corrections[word_form] = self.freq_table_clean_up(word_form)
+                word['post_correction'] = corrections[word_form]
+        self.freq_table_clean_up.maybe_save_cache()
 
         return sentences
 
@@ -5,7 +5,7 @@ from __future__ import absolute_import, division, unicode_literals
 import os
 import json
 import string
-from collections import Counter
+from collections import Counter, defaultdict
 
 from spellchecker.utils import load_file, write_file, _parse_into_words, ENSURE_UNICODE
 from spellchecker import WordFrequency
@@ -25,6 +25,9 @@ class SpellChecker(object):
             distance (int): The edit distance to use. Defaults to 2.
             case_sensitive (bool): Flag to use a case sensitive dictionary or \
             not, only available when not using a language dictionary.
+            table (MappedTable): A memory-mapped frequency table, see \
+            lib.post_correction.mapped_table; if provided, no dictionary is \
+            loaded and the start and end sets are read from the table
         Note:
             Using a case sensitive dictionary can be slow to correct words."""
 
@@ -38,7 +41,8 @@ class SpellChecker(object):
         distance=2,
         tokenizer=None,
         case_sensitive=False,
-        start_length=3
+        start_length=3,
+        table=None
     ):
         self._distance = None
         self.distance = distance  # use the setter value check
@@ -48,6 +52,12 @@ class SpellChecker(object):
             self._tokenizer = tokenizer
 
         self._case_sensitive = case_sensitive if not language else False
+        if table is not None:
+            self._word_frequency = table.word_frequency
+            self._start_length = table.start_length
+            self._start_set = table.start_set
+            self._end_set = table.end_set
+            return
         self._word_frequency = WordFrequency(self._tokenizer, self._case_sensitive)
 
         if local_dictionary:
@@ -318,3 +328,126 @@ class SpellChecker(object):
             pass
 
         return True
+
+
+class SymmetricDeleteSpellChecker(SpellChecker):
+    """ A SpellChecker that finds its candidates with a symmetric delete
+        index, as in SymSpell (https://github.com/wolfgarbe/SymSpell), instead
+        of generating all edits of a word at request time. Every word in the
+        dictionary is indexed under all strings that result from deleting up to
+        `distance` of its letters; the candidates for a word are then found by
+        looking up its own deletes.
+
+        At distance 1 the candidates are the same as those of SpellChecker,
+        including its restriction that the first letter and the last two
+        letters of a word are not edited. At distance 2, all known words within
+        an optimal string alignment distance of 2 are candidates.
+
+        Args:
+            See SpellChecker
+        Note:
+            The index is built on the first correction, or by calling
+            `build_index`. It has to be rebuilt when the word frequency is
+            changed. """
+
+    __slots__ = ["_deletes", "_index_distance"]
+
+    def __init__(self, *args, **kwargs):
+        super(SymmetricDeleteSpellChecker, self).__init__(*args, **kwargs)
+        self._deletes = None
+        self._index_distance = None
+
+    def build_index(self):
+        """ Build the symmetric delete index for the current word frequency
+            and distance """
+        deletes = defaultdict(list)
+        for word in self._word_frequency.dictionary:
+            for delete in self._deletes_of(word):
+                deletes[delete].append(word)
+        self._deletes = dict(deletes)
+        self._index_distance = self._distance
+
+    def _deletes_of(self, word):
+        """ All strings that result from deleting up to `distance` letters
+            from the word, including the word itself """
+        result = {word}
+        edge = {word}
+        for _ in range(self._distance):
+            edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))}
+            result.update(edge)
+        return result
+
+    def candidates(self, word):
+        """ Generate possible spelling corrections for the provided word up to
+            an edit distance of two, if and only when needed
+
+            Args:
+                word (str): The word for which to calculate candidate spellings
+            Returns:
+                set: The set of words that are possible candidates """
+        if self._known_single(word):  # short-cut if word is correct already
+            return {word}
+
+        if not self._check_if_should_check(word):
+            return {word}
+
+        if self._deletes is None or self._index_distance != self._distance:
+            self.build_index()
+        query = word.lower() if not self._case_sensitive else word
+        found = set(
+            candidate
+            for delete in self._deletes_of(query)
+            for candidate in self._deletes.get(delete, ())
+            if self._check_if_should_check(candidate)
+        )
+        tmp = set(c for c in found if self._is_edit_distance_1(query, c))
+        if tmp:
+            return tmp
+        if self._distance == 2:
+            tmp = set(c for c in found if _osa_distance(query, c, 2) <= 2)
+            if tmp:
+                return tmp
+        return {word}
+
+    def _is_edit_distance_1(self, word, candidate):
+        """ Whether the candidate is among the strings generated by
+            SpellChecker.edit_distance_1 for the word, i.e. a single delete,
+            transpose, replace or insert that leaves the first letter and the
+            last two letters untouched """
+        if abs(len(word) - len(candidate)) > 1:
+            return False
+        for i in range(1, len(word) - 2):
+            if candidate[i - 1] != word[i - 1]:
+                break  # the candidate has to start with word[:i]
+            right, tail = word[i:], candidate[i:]
+            if (
+                tail == right[1:]  # delete
+                or tail == right[1] + right[0] + right[2:]  # transpose
+                or (len(tail) == len(right) and tail[1:] == right[1:])  # replace
+                or tail[1:] == right  # insert
+            ):
+                return True
+        return False
+
+
+def _osa_distance(first, second, max_distance):
+    """ The optimal string alignment distance, i.e. the Damerau-Levenshtein
+        distance in which no substring is edited twice. Stops early and
+        returns max_distance + 1 once the distance exceeds max_distance. """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
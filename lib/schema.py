@@ -4,6 +4,8 @@ import os.path as op
 
 from typing import List, Dict, Tuple, Optional
 
+from lib.document import to_json
+
 
 class Validator:
     """
@@ -53,7 +55,7 @@ class Validator:
         :param json_data: Pipeline output data that is to be verified against the schema.
         :return: None, exception is raised if validation fails.
         """
-        jsonschema.validate(json_data, self.schema)
+        jsonschema.validate(to_json(json_data), self.schema)
 
     def _ignore_post_correction(self):
         self.schema['definitions']['word']['required'].remove('post_correction')
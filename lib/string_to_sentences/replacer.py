@@ -1,5 +1,7 @@
-import re
-from typing import List, Dict, Union, Callable, Pattern
+from collections import deque
+from typing import List, Dict, Union, Callable, Pattern, Iterable
+
+from lib.string_to_sentences.sequence_automaton import PatternClassifier, SequenceAutomaton
 
 
 class Replacer:
@@ -13,6 +15,19 @@ class Replacer:
         """
         self.from_key = from_key
         self.to_key = to_key
+        # all patterns share one classifier, so each word form is matched once against every regex
+        self.classifier = PatternClassifier()
+        self.automata: Dict[tuple, SequenceAutomaton] = {}
+
+    def automaton(self, *sequences: List[Union[str, Pattern]]):
+        """
+        :param sequences: One or more sequences of patterns
+        :return: The automaton that finds all of the sequences in one scan, compiled once per combination of sequences
+        """
+        key = tuple(tuple(patterns) for patterns in sequences)
+        if key not in self.automata:
+            self.automata[key] = SequenceAutomaton([list(patterns) for patterns in sequences], self.classifier)
+        return self.automata[key]
 
     def return_matches(self, words: List[Dict], patterns: List[Union[str, Pattern]], start: int = 0):
         """
@@ -23,12 +38,8 @@ class Replacer:
         :return: Indices of matches, offset by the start parameter.
         """
         n = len(patterns)
-        matches = []
-        for i in range(len(words) - n):
-            words_sub = words[i:i + n]
-            if all([re.search(p, w[self.from_key]) for p, w in zip(patterns, words_sub)]):
-                matches.append(i + start)
-        return matches
+        starts = self.automaton(patterns).find([w[self.from_key] for w in words])[0]
+        return [i + start for i in starts if i < len(words) - n]
 
     def get_replacement_inputs(self, words_sub: List[Dict], patterns: List[Pattern]):
         """
@@ -54,27 +65,70 @@ class Replacer:
             is placed in the list of words in their place.
         :param recursive: Whether to apply the replacement also to words that have already been replaced. If False
             (default), the search will skip to the end of the replaced words after a replacement.
-        :return:
+        :return: A new list of words with the replacements, built in a single forward scan over the words.
         """
         n = len(patterns)
-        i = 0
-        while i < len(words) - n + 1:
-            if all(
-                    p.search(w[self.from_key]) for p, w in zip(patterns, words[i:i + n])
-            ):
-                words_sub = words[i:i + n]
+        automaton = self.automaton(patterns)
+        if not recursive:
+            # replaced words are never searched again, so all matches can be found in the original words beforehand
+            starts = set(automaton.find([w[self.from_key] for w in words])[0])
+            output = []
+            i = 0
+            while i <= len(words) - n:
+                if i in starts:
+                    words_sub = words[i:i + n]
+                    output.extend(replace_function(self.get_replacement_inputs(words_sub, patterns)))
+                    # the search continues after the replacements
+                    i += n
+                else:
+                    output.append(words[i])
+                    i += 1
+            output.extend(words[i:])
+            return output
+
+        output = []
+        # the words that still have to be scanned, in reverse order, so the next word is popped from the end
+        remaining = words[::-1]
+        while len(remaining) >= n:
+            if automaton.matches_at([remaining[-1 - j][self.from_key] for j in range(n)]):
+                words_sub = [remaining.pop() for _ in range(n)]
                 replacements = replace_function(self.get_replacement_inputs(words_sub, patterns))
-                for j, word_sub in enumerate(words_sub):
-                    word = words.pop(i)
-                    assert word == word_sub
-                for replacement in replacements[::-1]:
-                    words.insert(i, replacement)
+                # the search continues one word after the start of the match, i.e. at the second replacement
+                remaining.extend(replacements[::-1])
+                if remaining:
+                    output.append(remaining.pop())
+            else:
+                output.append(remaining.pop())
+        output.extend(remaining[::-1])
+        return output
 
-                if not recursive:
-                    i += len(replacements) - 1
+    def replace_words_stream(self, words: Iterable[Dict], patterns: List[Pattern], replace_function: Callable):
+        """
+        Generator version of :meth:`replace_words` (not recursive), which looks ahead at most len(patterns) words.
 
-            i += 1
-        return words
+        :param words: The words in which to search for patterns and apply replacements, e.g. a generator.
+        :param patterns: The patterns to search.
+        :param replace_function: The replace_function is called on the words found to match the patterns and the output
+            is yielded in their place.
+        :return: Generator of the words with the replacements, the same words as returned by :meth:`replace_words`.
+        """
+        n = len(patterns)
+        automaton = self.automaton(patterns)
+        window = deque()
+        state = 0
+        for word in words:
+            window.append(word)
+            state = automaton.advance(state, word[self.from_key])
+            if len(window) == n:
+                # a match that ends at this word starts at the first word of the window
+                if state & automaton.end_mask:
+                    yield from replace_function(self.get_replacement_inputs(list(window), patterns))
+                    window.clear()
+                    # matches cannot start in the replaced words
+                    state = 0
+                else:
+                    yield window.popleft()
+        yield from window
 
     def joinor(self):
         """
@@ -103,7 +157,9 @@ class Replacer:
             if reg[0] == 0:  # the first word keeps the other fields
                 word = orig_word.copy()
             else:  # subsequent words are empty
-                word = {key: '' for key, val in orig_word.items()}
+                word = orig_word.copy()
+                for key in list(word):
+                    word[key] = ''
                 word['begin_char'] = None
                 word['end_char'] = None
                 word['ner'] = orig_word['ner']
@@ -0,0 +1,127 @@
+import re
+from typing import Dict, List, Pattern, Union
+
+
+class PatternClassifier:
+    """
+    Classifies words against the union of all per-word regexes of the sequence patterns. Each regex gets a bit, and a
+    word is classified once into the bitmask of the regexes it matches with ``search``.
+    """
+    def __init__(self, max_cache_size: int = 100000):
+        """
+        :param max_cache_size: Maximal number of word forms of which the bitmask is kept, the cache is emptied when it
+            is full.
+        """
+        self.regexes: List[Pattern] = []
+        self.bits: Dict[tuple, int] = {}
+        self.cache: Dict[str, int] = {}
+        self.max_cache_size = max_cache_size
+
+    def bit(self, pattern: Union[str, Pattern]):
+        """
+        :param pattern: A regex, patterns that are equal share a bit
+        :return: The bit of the regex
+        """
+        regex = re.compile(pattern)
+        key = (regex.pattern, regex.flags)
+        if key not in self.bits:
+            self.bits[key] = len(self.regexes)
+            self.regexes.append(regex)
+            # words that have already been classified are not classified against the new regex
+            self.cache.clear()
+        return self.bits[key]
+
+    def __call__(self, word: str):
+        """
+        :param word: The word to classify
+        :return: The bitmask with the bits of the regexes that the word matches
+        """
+        mask = self.cache.get(word)
+        if mask is None:
+            mask = 0
+            for bit, regex in enumerate(self.regexes):
+                if regex.search(word):
+                    mask |= 1 << bit
+            if len(self.cache) >= self.max_cache_size:
+                self.cache.clear()
+            self.cache[word] = mask
+        return mask
+
+
+class SequenceAutomaton:
+    """
+    Finds sequences of words of which each word matches the regex at its position in one of the sequence patterns. The
+    patterns are compiled into a Shift-And automaton: every position of every pattern is a bit of the state, which is
+    advanced over the words with one shift and one mask per word, so no window is tested against the regexes again.
+    """
+    def __init__(self, sequences: List[List[Union[str, Pattern]]], classifier: PatternClassifier):
+        """
+        :param sequences: The sequence patterns, each a list of regexes that consecutive words have to match
+        :param classifier: The classifier of the words, to which the regexes are added
+        """
+        self.classifier = classifier
+        self.lengths = [len(sequence) for sequence in sequences]
+        # bit i of the state is the i-th position over all concatenated sequences
+        self.offsets = []
+        self.start_bits = 0
+        self.regex_positions: Dict[int, int] = {}
+        offset = 0
+        for sequence in sequences:
+            self.offsets.append(offset)
+            self.start_bits |= 1 << offset
+            for position, pattern in enumerate(sequence, start=offset):
+                bit = classifier.bit(pattern)
+                self.regex_positions[bit] = self.regex_positions.get(bit, 0) | 1 << position
+            offset += len(sequence)
+        self.end_bits = [1 << (offset + length - 1) for offset, length in zip(self.offsets, self.lengths)]
+        self.end_mask = sum(self.end_bits)
+        self.position_masks: Dict[int, int] = {}
+
+    def position_mask(self, word: str):
+        """
+        :param word: A word
+        :return: The mask of the positions in the sequences of which the regex matches the word
+        """
+        word_mask = self.classifier(word)
+        mask = self.position_masks.get(word_mask)
+        if mask is None:
+            mask = 0
+            for bit, positions in self.regex_positions.items():
+                if word_mask >> bit & 1:
+                    mask |= positions
+            self.position_masks[word_mask] = mask
+        return mask
+
+    def find(self, words: List[str]):
+        """
+        :param words: The words to search
+        :return: For each sequence pattern the sorted start indices of the words where it matches
+        """
+        starts = [[] for _ in self.lengths]
+        state = 0
+        for end, word in enumerate(words):
+            state = ((state << 1) | self.start_bits) & self.position_mask(word)
+            if state:
+                for sequence, end_bit in enumerate(self.end_bits):
+                    if state & end_bit:
+                        starts[sequence].append(end - self.lengths[sequence] + 1)
+        return starts
+
+    def advance(self, state: int, word: str):
+        """
+        Advances the automaton over one word, for searching a stream of words.
+
+        :param state: The state after the previous word, 0 at the start
+        :param word: The next word
+        :return: The new state, which has the bit of end_bits of a sequence set if the sequence ends at this word
+        """
+        return ((state << 1) | self.start_bits) & self.position_mask(word)
+
+    def matches_at(self, words: List[str], sequence: int = 0):
+        """
+        :param words: The words of a window of the length of the sequence pattern
+        :param sequence: The index of the sequence pattern
+        :return: Whether each word matches the regex at its position
+        """
+        offset = self.offsets[sequence]
+        return all(self.position_mask(word) >> (offset + j) & 1 for j, word in enumerate(words))
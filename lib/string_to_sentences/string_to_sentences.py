@@ -1,7 +1,8 @@
 import logging
 import re
-from typing import List, Pattern, Dict
+from typing import List, Pattern, Dict, Iterable, Union, TextIO
 
+from lib.document import Word
 from lib.string_to_sentences.replacer import Replacer
 
 logger = logging.getLogger(__name__)
@@ -49,6 +50,45 @@ class StringToSentences:
 
         return sentences
 
+    def stream(self, text: Union[str, TextIO], chunk_size: int = 65536):
+        """
+        Generator version of :meth:`__call__` for very large texts. The text is read in chunks and each sentence is
+        yielded as soon as the first word of the next sentence has been read, so only the current sentence and a few
+        words of lookahead for the line-break joins are kept in memory.
+
+        :param text: A string representing the historic text, or a file-like object from which it is read.
+        :param chunk_size: Number of characters that is read from the text at a time.
+        :return: Generator of the same sentences as returned by :meth:`__call__`, with begin_char and end_char counted
+            from the start of the whole text.
+        """
+        words = self.iter_words(text, chunk_size)
+        for compiled in self.compiled_line_word_split_patterns:
+            words = self.replacer.replace_words_stream(words, compiled, self.replacer.joinor())
+        words = self.replacer.replace_words_stream(words, [self.ner_pattern], self._unset_ner)
+        yield from self.iter_sentences(words)
+
+    @staticmethod
+    def iter_words(text: Union[str, TextIO], chunk_size: int = 65536):
+        """
+        Generator version of :meth:`get_list_of_dict_word_and_chars`, which reads the text in chunks.
+        """
+        if isinstance(text, str):
+            chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+        else:
+            chunks = iter(lambda: text.read(chunk_size), '')
+        begin_char = 0
+        rest = ''
+        for chunk in chunks:
+            words = StringToSentences.split_rule.split(rest + chunk)
+            # the last word can continue in the next chunk
+            rest = words.pop()
+            for word in words:
+                if word:
+                    yield Word(word, begin_char, begin_char + len(word))
+                    begin_char += len(word)
+        if rest:
+            yield Word(rest, begin_char, begin_char + len(rest))
+
     @staticmethod
     def get_list_of_dict_word_and_chars(text):
         """
@@ -65,12 +105,9 @@ class StringToSentences:
         begin_chars = [0] + end_chars[:-1]
 
         # Combine to dict adding ner info to it
-        word_list_with_labels = [{
-            "word": word,
-            "begin_char": begin_char,
-            "end_char": end_char,
-            "ner": True
-        } for word, begin_char, end_char in zip(words, begin_chars, end_chars) if word]
+        word_list_with_labels = [
+            Word(word, begin_char, end_char) for word, begin_char, end_char in zip(words, begin_chars, end_chars) if word
+        ]
 
         return word_list_with_labels
 
@@ -81,10 +118,13 @@ class StringToSentences:
         index = []
         sentences = []
 
-        # Generate index where to split on
-        index += self._return_matches(words, self.double_newline_pattern, start=1)
+        # Generate index where to split on, both patterns are found in one scan over the words
+        double_newlines, sentence_ends = self.replacer.automaton(
+            self.double_newline_pattern, self.sentence_end_pattern
+        ).find([w['word'] for w in words])
+        index += [i + 1 for i in double_newlines]
         # Example: world. Hello but not J. Jacobs
-        index += self._return_matches(words, self.sentence_end_pattern, start=2)
+        index += [i + 2 for i in sentence_ends]
 
         # Add beginning/end, sort index and remove double indices
         index = list(set([0] + index + [len(words)]))
@@ -101,6 +141,24 @@ class StringToSentences:
 
         return sentences
 
+    def iter_sentences(self, words: Iterable[Dict]):
+        """
+        Generator version of :meth:`split_in_sentences`, a sentence is yielded when the word that starts the next one
+        arrives.
+        """
+        automaton = self.replacer.automaton(self.double_newline_pattern, self.sentence_end_pattern)
+        state = 0
+        sentence = []
+        for word in words:
+            state = automaton.advance(state, word['word'])
+            # both patterns end at the first word of the next sentence
+            if state & automaton.end_mask and sentence:
+                yield self._make_sentence(sentence)
+                sentence = []
+            sentence.append(word)
+        if sentence:
+            yield self._make_sentence(sentence)
+
     def _make_sentence(self, words):
         end = self.replacer.replace_words(
             words[-2:],
@@ -113,15 +171,16 @@ class StringToSentences:
         """
         Set ner to False for words that match the NER (anti)pattern
         """
-        def replacement_function(match_words):
-            for word in match_words:
-                word['ner'] = False
-            return match_words
-
-        words = self.replacer.replace_words(words, [self.ner_pattern], replacement_function)
+        words = self.replacer.replace_words(words, [self.ner_pattern], self._unset_ner)
 
         return words
 
+    @staticmethod
+    def _unset_ner(match_words):
+        for word in match_words:
+            word['ner'] = False
+        return match_words
+
     @staticmethod
     def compile_line_word_split_patterns():
         patterns = [
@@ -144,18 +203,12 @@ class StringToSentences:
                                                 self.replacer.joinor())
         return words
 
-    @staticmethod
-    def _return_matches(words: List[Dict], pattern: List[Pattern], start=0):
+    @classmethod
+    def _return_matches(cls, words: List[Dict], pattern: List[Pattern], start=0):
         """
         Generic method to return the index of when a sublist matches a pattern.
         """
-        n = len(pattern)
-        matches = []
-        for i in range(len(words) - n + 1):
-            words_sub = words[i:i + n]
-            if all([p.search(w['word']) for p, w in zip(pattern, words_sub)]):
-                matches.append(i + start)
-        return matches
+        return [i + start for i in cls.replacer.automaton(pattern).find([w['word'] for w in words])[0]]
 
 
 if __name__ == "__main__":
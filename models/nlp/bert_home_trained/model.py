@@ -1,3 +1,7 @@
+import argparse
+import os.path as op
+
+import numpy as np
 import tensorflow as tf
 import tensorflow_hub as hub
 from official.nlp.bert import tokenization
@@ -8,6 +12,9 @@ import logging
 
 LOGGER = logging.getLogger(__name__)
 
+# names of the inputs of the model, in the order in which the Keras model takes them
+INPUT_NAMES = ('input_word_ids', 'input_mask', 'input_type_ids', 'is_heads')
+
 CONFIGS = {
     "second": {
         "nr_tags": 8,
@@ -28,8 +35,79 @@ def get_bert_ner_model(config):
     return model
 
 
+def variable_length_model(model: tf.keras.Model) -> tf.keras.Model:
+    """
+    :param model: A Keras model built with a fixed sequence length
+    :return: The same model with inputs of shape [None, None], it shares the layers, and so the weights, with model
+    """
+    inputs = [tf.keras.Input(shape=(None,), dtype=tensor.dtype, name=tensor.name.split(':')[0])
+              for tensor in model.inputs]
+    return tf.keras.models.clone_model(model, input_tensors=inputs, clone_function=lambda layer: layer)
+
+
+def max_prediction_difference(fixed_model: tf.keras.Model, model: tf.keras.Model, length: int, nr_rows: int = 4,
+                              seed: int = 0):
+    """
+    :param fixed_model: A Keras model built with a fixed sequence length
+    :param model: The model returned by :func:`variable_length_model` for fixed_model
+    :param length: The length of the rows of a random batch, which is padded to the fixed sequence length for
+        fixed_model only
+    :param nr_rows: The number of rows of the batch
+    :param seed: The seed of the random batch
+    :return: The maximum absolute difference between the predictions of both models for the tokens of the batch
+    """
+    fixed_length = fixed_model.input_shape[0][-1]
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(2, length + 1, size=nr_rows)
+    lengths[0] = length
+    masks = (np.arange(fixed_length) < lengths[:, None]).astype(np.int32)
+    ids = rng.integers(1, 100, size=masks.shape, dtype=np.int32) * masks
+    x = [ids, masks, np.zeros_like(ids), masks]
+    padded = BertTF.predict_function(fixed_model, fixed_length)(*[tf.constant(inputs) for inputs in x]).numpy()
+    dynamic = BertTF.predict_function(model)(*[tf.constant(inputs[:, :length]) for inputs in x]).numpy()
+    return float(np.abs(padded[:, :length] - dynamic)[masks[:, :length].astype(bool)].max())
+
+
+def export_variable_length(weights_path, output_path=None, nr_tags=8, check_length=64, tolerance=1e-4):
+    """
+    Rebuilds a BERT that was built with a fixed sequence length with inputs of shape [None, None], so
+    :class:`BertTF` runs it on length-bucketed batches, and saves it after checking that it gives the same predictions
+    as the original on a short batch.
+    :param weights_path: Path of the .h5 file of the Keras model
+    :param output_path: Path of the .h5 file to write, by default the weights_path with "-variable-length" appended
+    :param nr_tags: Number of tags used by the BERT
+    :param check_length: Length of the rows of the batch on which the predictions are compared
+    :param tolerance: Maximum absolute difference of the predictions
+    :return: The path of the .h5 file
+    """
+    bert = BertTF(nr_tags, weights_path)
+    if bert.dynamic_length:
+        LOGGER.info(f'{weights_path} already has a variable sequence length')
+        return weights_path
+    model = variable_length_model(bert.model)
+    difference = max_prediction_difference(bert.model, model, check_length)
+    LOGGER.info(f'Maximum absolute difference of the predictions with variable sequence length: {difference}')
+    if difference > tolerance:
+        raise ValueError(f'The predictions with variable sequence length differ by {difference} > {tolerance}')
+    output_path = output_path or op.splitext(weights_path)[0] + '-variable-length.h5'
+    model.save(output_path)
+    LOGGER.info(f'Exported the model with variable sequence length to {output_path}')
+    return output_path
+
+
 class BertTF:
-    def __init__(self, nr_tags, weights_path, batch_size=4):
+    # only a model with a variable sequence length accepts batches shorter than max_length, see __init__ and
+    # export_variable_length
+    dynamic_length = False
+
+    def __init__(self, nr_tags, weights_path, batch_size=4, max_length=512):
+        """
+        :param nr_tags: Number of tags used by the BERT
+        :param weights_path: Path of the .h5 file
+        :param batch_size: Number of rows of max_length in a batch, shorter rows are batched with the same number of
+            tokens
+        :param max_length: Maximum sequence length, only used if the model itself does not fix it
+        """
         self.model: tf.keras.Model = tf.keras.models.load_model(
             weights_path,
             custom_objects={  # must include these explicitly
@@ -46,10 +124,60 @@ class BertTF:
         else:
             LOGGER.error(f'Could not infer BERT casing from BERT layer name {bert_layer.name}')
             raise ValueError
+        self.vocab_file = vocab_file
+        self.do_lower_case = do_lower_case
         self.tokenizer = tokenization.FullTokenizer(vocab_file, do_lower_case=do_lower_case)
-        self.max_length = self.model.input_shape[0][-1]
+        self.dynamic_length = self.has_dynamic_length(self.model)
+        self.max_length = self.model.input_shape[0][-1] or max_length
         self.nr_tags = nr_tags
         self.batch_size = batch_size
+        self.predict_fn = self.predict_function(self.model, None if self.dynamic_length else self.max_length)
+        LOGGER.info(f'Loaded {weights_path} with {"variable" if self.dynamic_length else "fixed"} sequence length')
+
+    @staticmethod
+    def has_dynamic_length(model: tf.keras.Model):
+        """
+        :param model: The Keras model
+        :return: Whether all inputs of the model have shape [None, None], i.e. accept any batch size and sequence length
+        """
+        input_shapes = model.input_shape if isinstance(model.input_shape, list) else [model.input_shape]
+        return all(tuple(shape) == (None, None) for shape in input_shapes)
+
+    @staticmethod
+    def predict_function(model: tf.keras.Model, length: int = None):
+        """
+        :param model: The Keras model
+        :param length: The sequence length of the inputs, None for a model with a variable sequence length
+        :return: A tf.function calling the model that accepts the four inputs with any batch size
+        """
+        @tf.function(input_signature=[tf.TensorSpec([None, length], tf.int32, name=name) for name in INPUT_NAMES])
+        def predict(*inputs):
+            return model(list(inputs), training=False)
+        return predict
 
     def __call__(self, x):
-        return self.model.predict(x)
+        """
+        :param x: The four inputs, padded to max_length, or to at most max_length if the model has a variable sequence
+            length
+        :return: The predictions, of shape (rows, length of x, nr_tags)
+        """
+        nr_rows, length = np.shape(x[0])
+        rows_per_batch = max(self.batch_size * self.max_length // max(length, 1), 1)
+        results = [
+            self.predict_fn(*[tf.constant(inputs[begin:begin + rows_per_batch], dtype=tf.int32)
+                              for inputs in x]).numpy()
+            for begin in range(0, nr_rows, rows_per_batch)
+        ]
+        if not results:
+            return np.zeros((0, length, self.nr_tags), dtype=np.float32)
+        return np.concatenate(results)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Export a Keras BERT (.h5) with a variable sequence length')
+    parser.add_argument('weights_path', type=str)
+    parser.add_argument('--output_path', type=str, default=None)
+    parser.add_argument('--nr_tags', type=int, default=8)
+    args = parser.parse_args()
+    export_variable_length(args.weights_path, args.output_path, args.nr_tags)
@@ -0,0 +1,124 @@
+import argparse
+import json
+import logging
+import os.path as op
+import shutil
+
+import numpy as np
+import tensorflow as tf
+from official.nlp.bert import tokenization
+
+from models.nlp.bert_home_trained.model import INPUT_NAMES, BertTF
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def metadata_path(tflite_path):
+    """
+    :param tflite_path: Path of the .tflite file
+    :return: Path of the json file with the information that cannot be stored in the .tflite file itself
+    """
+    return op.splitext(tflite_path)[0] + '.json'
+
+
+def export_tflite(weights_path, tflite_path=None, nr_tags=8):
+    """
+    Converts a Keras BERT to a TFLite model with dynamic-range int8 quantization of the weights, which is considerably
+    smaller and faster on CPU. The vocab file and casing of the tokenizer are stored next to the .tflite file.
+    :param weights_path: Path of the .h5 file of the Keras model
+    :param tflite_path: Path of the .tflite file to write, by default the weights_path with the extension replaced
+    :param nr_tags: Number of tags used by the BERT
+    :return: The path of the .tflite file
+    """
+    tflite_path = tflite_path or op.splitext(weights_path)[0] + '.tflite'
+    bert = BertTF(nr_tags, weights_path)
+
+    # the signature has a variable sequence length if the Keras model has, see BertTF.has_dynamic_length
+    # without passing the model as trackable object, the variables are frozen into constants
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([bert.predict_fn.get_concrete_function()])
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]  # dynamic-range quantization
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    LOGGER.info(f'Converting {weights_path} to TFLite')
+    with open(tflite_path, 'wb') as f:
+        f.write(converter.convert())
+
+    vocab_file = bert.vocab_file.decode() if isinstance(bert.vocab_file, bytes) else bert.vocab_file
+    tflite_vocab_file = op.splitext(tflite_path)[0] + '.vocab.txt'
+    shutil.copy(vocab_file, tflite_vocab_file)
+    with open(metadata_path(tflite_path), 'w') as f:
+        json.dump({
+            'max_length': bert.max_length,
+            'dynamic_length': bert.dynamic_length,
+            'do_lower_case': bert.do_lower_case,
+            'vocab_file': op.basename(tflite_vocab_file),
+        }, f, indent=4)
+    LOGGER.info(f'Exported TFLite model to {tflite_path}')
+    return tflite_path
+
+
+class BertTFLite:
+    """
+    Runs a BERT exported by :func:`export_tflite` with the TFLite interpreter. Has the same interface as
+    :class:`BertTF <models.nlp.bert_home_trained.model.BertTF>`.
+    """
+    def __init__(self, nr_tags, weights_path, batch_size=8, num_threads=None):
+        """
+        :param nr_tags: Number of tags used by the BERT
+        :param weights_path: Path of the .tflite file
+        :param batch_size: Number of rows of max_length passed to the interpreter at once, shorter rows are passed with
+            the same number of tokens if the model has a variable sequence length
+        :param num_threads: Number of threads used by the interpreter, by default determined by TFLite
+        """
+        with open(metadata_path(weights_path)) as f:
+            metadata = json.load(f)
+        vocab_file = op.join(op.dirname(weights_path), metadata['vocab_file'])
+        self.tokenizer = tokenization.FullTokenizer(vocab_file, do_lower_case=metadata['do_lower_case'])
+        self.max_length = metadata['max_length']
+        self.dynamic_length = metadata.get('dynamic_length', False)
+        self.nr_tags = nr_tags
+        self.batch_size = batch_size
+
+        self.interpreter = tf.lite.Interpreter(model_path=weights_path, num_threads=num_threads)
+        input_details = {detail['name']: detail for detail in self.interpreter.get_input_details()}
+        # the converter drops inputs that the model does not use, so map position in x to tensor index
+        self.input_indices = {i: input_details[name]['index']
+                              for i, name in enumerate(INPUT_NAMES) if name in input_details}
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self._allocated_shape = None
+
+    def _resize(self, shape):
+        if shape != self._allocated_shape:
+            for index in self.input_indices.values():
+                self.interpreter.resize_tensor_input(index, list(shape))
+            self.interpreter.allocate_tensors()
+            self._allocated_shape = shape
+
+    def __call__(self, x):
+        """
+        :param x: The inputs as given by :meth:`InputData.get_x <data_suppliers.text.nerbio.data_classes.InputData>`,
+            padded to at most max_length if the model has a variable sequence length
+        :return: The predictions, of shape (rows, length of x, nr_tags)
+        """
+        nr_rows, length = np.shape(x[0])
+        rows_per_batch = max(self.batch_size * self.max_length // max(length, 1), 1)
+        results = []
+        for begin in range(0, nr_rows, rows_per_batch):
+            self._resize((min(rows_per_batch, nr_rows - begin), length))
+            for i, index in self.input_indices.items():
+                self.interpreter.set_tensor(index, np.asarray(x[i][begin:begin + rows_per_batch], dtype=np.int32))
+            self.interpreter.invoke()
+            results.append(self.interpreter.get_tensor(self.output_index))
+        if not results:
+            return np.zeros((0, length, self.nr_tags), dtype=np.float32)
+        return np.concatenate(results)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Export a Keras BERT (.h5) to a quantized TFLite model (.tflite)')
+    parser.add_argument('weights_path', type=str)
+    parser.add_argument('--tflite_path', type=str, default=None)
+    parser.add_argument('--nr_tags', type=int, default=8)
+    args = parser.parse_args()
+    export_tflite(args.weights_path, args.tflite_path, args.nr_tags)
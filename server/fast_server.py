@@ -3,16 +3,20 @@ import argparse
 import logging
 import traceback
 import sys
-import time
+import uuid
+from concurrent import futures
 from flask import Flask, request, jsonify
 
 from server.exceptions import BadRequest, InternalServerError
-from server.parallel_support import Work, create_queues
+from server.parallel_support import Work, Dispatcher, create_queues, MIN_COLUMNAR_TOKENS, MIN_SHARED_BYTES
+from lib.document import to_json
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
 app = Flask(__name__)
+# seconds to wait for the result of a request, None to wait forever
+app.config['REQUEST_TIMEOUT'] = 600.
 
 
 @app.route("/")
@@ -54,14 +58,14 @@ ALL steps are executed in this order. If an empty list is provided, an error is
 
         # Execute NER
         try:
-            uuid = time.time()
-            work = Work(uuid, **data)
-            pre_queue.put_nowait(work)
-            while True:
-                work = done_queue.get()
-                if work.uuid == uuid:
-                    break
-                done_queue.put(work)
+            work = Work(uuid.uuid4().hex, **data)
+            work = dispatcher.submit(work).result(timeout=app.config['REQUEST_TIMEOUT'])
+
+        except futures.TimeoutError:
+            dispatcher.forget(work.uuid)
+            message = f"The pipeline did not finish within {app.config['REQUEST_TIMEOUT']} seconds"
+            logger.error(message)
+            raise InternalServerError(message, status_code=504)
 
         except Exception as _:
             error_trace = traceback.format_exc()
@@ -70,7 +74,7 @@ ALL steps are executed in this order. If an empty list is provided, an error is
 
         logger.info('Function call_pipeline() returned successfully')
         return {
-            "results": work.data,
+            "results": to_json(work.data),
             "message": "Success"
         }
 
@@ -102,11 +106,29 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--configfile', type=str, default='server/config_NA.json')
     parser.add_argument('--n_parallel', type=int, default=4)
+    parser.add_argument('--bert_batch_sentences', type=int, default=256,
+                        help='Gather requests until a BERT batch has this many sentences, 1 disables batching')
+    parser.add_argument('--bert_batch_wait', type=float, default=0.05,
+                        help='Maximum time in seconds to wait for more requests to add to a BERT batch')
+    parser.add_argument('--min_shared_bytes', type=int, default=MIN_SHARED_BYTES,
+                        help='Hand off documents of at least this many bytes between the stages through shared memory')
+    parser.add_argument('--min_columnar_tokens', type=int, default=MIN_COLUMNAR_TOKENS,
+                        help='Encode documents of at least this many tokens column by column between the stages')
+    parser.add_argument('--request_timeout', type=float, default=app.config['REQUEST_TIMEOUT'],
+                        help='Respond with an error if a request is not finished within this many seconds')
     args, unknown = parser.parse_known_args()
     argument_dict = vars(args)
     with open(argument_dict["configfile"]) as f:
         config = json.load(f)
 
-    pre_queue, bert_queue, post_queue, done_queue = create_queues(config, argument_dict["n_parallel"])
+    pre_queue, bert_queue, post_queue, done_queue = create_queues(
+        config, argument_dict["n_parallel"],
+        max_batch_sentences=argument_dict["bert_batch_sentences"],
+        max_batch_wait=argument_dict["bert_batch_wait"],
+        min_shared_bytes=argument_dict["min_shared_bytes"],
+        min_columnar_tokens=argument_dict["min_columnar_tokens"]
+    )
+    dispatcher = Dispatcher(pre_queue, done_queue)
+    app.config['REQUEST_TIMEOUT'] = argument_dict["request_timeout"]
 
     app.run(host="0.0.0.0", port="5005")
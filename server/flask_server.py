@@ -11,6 +11,7 @@ from flask import Flask, request, jsonify
 # Project imports
 from server.exceptions import BadRequest, InternalServerError
 from lib.pipeline import Pipeline
+from lib.document import to_json
 
 # Define logger and set logger output
 logger = logging.getLogger(__name__)
@@ -79,7 +80,7 @@ ALL steps are executed in this order. If an empty list is provided, an error is
 
         logger.info('Function call_pipeline() returned successfully')
         return {
-            "results": result,
+            "results": to_json(result),
             "message": "Success"
         }
 
@@ -1,9 +1,82 @@
 import logging
-from multiprocessing import Process, Queue
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from multiprocessing import Process, Queue, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional
 
+from lib.document import Document, to_buffer, from_buffer
 from lib.pipeline import Pipeline
 # from tests.mock_pipeline import Pipeline
 
+# documents of which the columnar buffer has at least this many bytes (about 50k tokens) are handed off through shared
+# memory, which has to fit in /dev/shm
+MIN_SHARED_BYTES = 8 << 20
+# smaller documents are pickled through the queue as they are, which is faster than the columnar encoding below this
+# many tokens, see benchmarks/queue_hand_off.py
+MIN_COLUMNAR_TOKENS = 2000
+
+
+class DocumentHandle:
+    """
+    A document on its way from one stage to the next. The document is encoded by :func:`to_buffer
+    <lib.document.to_buffer>`, and a buffer of at least min_shared_bytes is copied into a shared memory block, so only
+    the name of the block is pickled through the queue. The block is unlinked by :meth:`load`, so a handle is loaded
+    once.
+    """
+    def __init__(self, document: Document, min_shared_bytes: Optional[int] = MIN_SHARED_BYTES):
+        """
+        :param document: The document to hand off
+        :param min_shared_bytes: Minimal size of the buffer to use shared memory, None to never use it
+        """
+        self.nr_sentences = len(document)
+        buffer = to_buffer(document)
+        self.size = len(buffer)
+        self.name = None
+        self.buffer = None
+        if min_shared_bytes is not None and self.size >= min_shared_bytes:
+            try:
+                block = SharedMemory(create=True, size=self.size)
+            except OSError as error:
+                logging.warning(f"Cannot create shared memory of {self.size} bytes, using the queue instead: {error}")
+            else:
+                block.buf[:self.size] = buffer
+                self.name = block.name
+                block.close()
+        if self.name is None:
+            self.buffer = bytes(buffer)
+
+    def __len__(self):
+        return self.nr_sentences
+
+    def load(self) -> Document:
+        """
+        :return: The document, read from the shared memory block, which is unlinked afterwards
+        """
+        if self.name is None:
+            return from_buffer(self.buffer)
+        block = SharedMemory(name=self.name)
+        try:
+            view = block.buf[:self.size]
+            try:
+                return from_buffer(view)
+            finally:
+                view.release()
+        finally:
+            block.close()
+            block.unlink()
+
+
+class WorkError(Exception):
+    """
+    Raised for a :class:`Work` that failed in one of the stages, with the traceback of the original error as message.
+    """
+    pass
+
+
 class Work:
     def __init__(self, uuid, input_data, steps=None):
         self.uuid = uuid
@@ -12,23 +85,209 @@ class Work:
             self.steps = ["string_to_sentences", "post_correction", "ner_bert", "ner_lists", "modernisation"]
         else:
             self.steps = steps
+        # the traceback of the error if a stage failed, the later stages pass the work on without doing it
+        self.error: Optional[str] = None
+
+    def fail(self):
+        """
+        Marks the work as failed with the exception that is being handled, and drops its data.
+        """
+        self.error = traceback.format_exc()
+        self.data = None
+
+    def pack(self, min_shared_bytes: Optional[int] = MIN_SHARED_BYTES,
+             min_columnar_tokens: Optional[int] = MIN_COLUMNAR_TOKENS):
+        """
+        Replaces a document by a :class:`DocumentHandle`, before the work is put on a queue. Small documents are left
+        as they are.
+        :param min_shared_bytes: See :class:`DocumentHandle`
+        :param min_columnar_tokens: Minimal number of tokens of a document to replace it, None to never replace it
+        """
+        if isinstance(self.data, Document) and min_columnar_tokens is not None and \
+                sum(len(sentence) for sentence in self.data) >= min_columnar_tokens:
+            self.data = DocumentHandle(self.data, min_shared_bytes)
 
+    def unpack(self):
+        """
+        Replaces a :class:`DocumentHandle` by its document, after the work is taken from a queue.
+        """
+        if isinstance(self.data, DocumentHandle):
+            self.data = self.data.load()
 
-def target_wrapper(q, done_q, conf, nr):
+
+def target_wrapper(q, done_q, conf, nr, min_shared_bytes=MIN_SHARED_BYTES, min_columnar_tokens=MIN_COLUMNAR_TOKENS):
+    """
+    :param min_shared_bytes: See :class:`DocumentHandle`
+    :param min_columnar_tokens: See :meth:`Work.pack`
+    """
     logging.info(f'Starting worker {nr}')
     logging.info(f'q in target: {q}')
     pipeline = Pipeline(conf)
     # Read from the queue; this will be spawned as a separate Process
     while True:
         work = q.get()
-        relevant_steps = tuple(step for step in work.steps if step in conf)
-        # logging.info(f"Work starting on {nr}")
-        work.data = pipeline(work.data, relevant_steps)
-        # logging.info(f"Work finishing on {nr}")
+        if work.error is None:
+            try:
+                work.unpack()
+                relevant_steps = tuple(step for step in work.steps if step in conf)
+                # logging.info(f"Work starting on {nr}")
+                work.data = pipeline(work.data, relevant_steps)
+                # logging.info(f"Work finishing on {nr}")
+                work.pack(min_shared_bytes, min_columnar_tokens)
+            except Exception:
+                logging.exception(f'Worker {nr} failed on work {work.uuid}')
+                work.fail()
         done_q.put(work)
 
 
-def create_queues(conf, n_parallel):
+def bert_batch_target_wrapper(q, done_q, conf, nr, max_batch_sentences, max_batch_wait,
+                              min_shared_bytes=MIN_SHARED_BYTES, min_columnar_tokens=MIN_COLUMNAR_TOKENS):
+    """
+    Like :func:`target_wrapper`, but gathers the work of several requests and runs the sentences of all of them through
+    BERT in one go, see :meth:`MultipleBerts.call_batch <lib.ner_bert.ner_bert.MultipleBerts.call_batch>`.
+
+    :param max_batch_sentences: Stop gathering work once the batch contains at least this many sentences.
+    :param max_batch_wait: Stop gathering work this many seconds after the first work of the batch was received.
+    :param min_shared_bytes: See :class:`DocumentHandle`
+    :param min_columnar_tokens: See :meth:`Work.pack`
+    """
+    logging.info(f'Starting batching BERT worker {nr}')
+    pipeline = Pipeline(conf)
+    while True:
+        batch = get_batch(q, max_batch_sentences, max_batch_wait)
+        for work in batch:
+            try:
+                work.unpack()
+            except Exception:
+                logging.exception(f'Batching BERT worker {nr} failed on work {work.uuid}')
+                work.fail()
+        bert_batch = [work for work in batch if 'ner_bert' in work.steps and work.error is None]
+        if bert_batch:
+            logging.info(f'Doing ner_bert on a batch of {len(bert_batch)} requests')
+            try:
+                pipeline.ner_bert.call_batch([work.data for work in bert_batch])
+            except Exception:
+                # retry the requests one by one, so only the request that causes the error fails
+                logging.exception(f'ner_bert failed on a batch of {len(bert_batch)} requests, retrying them one by one')
+                for work in bert_batch:
+                    try:
+                        pipeline.ner_bert.call_batch([work.data])
+                    except Exception:
+                        logging.exception(f'ner_bert failed on work {work.uuid}')
+                        work.fail()
+        for work in batch:
+            try:
+                work.pack(min_shared_bytes, min_columnar_tokens)
+            except Exception:
+                logging.exception(f'Batching BERT worker {nr} failed on work {work.uuid}')
+                work.fail()
+            done_q.put(work)
+
+
+def get_batch(q, max_batch_sentences, max_batch_wait) -> List[Work]:
+    """
+    :param q: The queue to take work from, blocks until at least one piece of work is available.
+    :param max_batch_sentences: See :func:`bert_batch_target_wrapper`
+    :param max_batch_wait: See :func:`bert_batch_target_wrapper`
+    :return: A list of work, the size of which is determined by the work available on the queue and the limits.
+    """
+    batch = [q.get()]
+    deadline = time.monotonic() + max_batch_wait
+    nr_sentences = _nr_bert_sentences(batch[0])
+    while nr_sentences < max_batch_sentences:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            work = q.get(timeout=timeout)
+        except queue.Empty:
+            break
+        batch.append(work)
+        nr_sentences += _nr_bert_sentences(work)
+    return batch
+
+
+def _nr_bert_sentences(work: Work):
+    return len(work.data) if 'ner_bert' in work.steps and work.error is None else 0
+
+
+class Dispatcher:
+    """
+    Hands finished work back to the request that submitted it. A single background thread drains the done queue and
+    completes the :class:`Future` registered for the uuid of each :class:`Work`, so every request only waits for its own
+    result instead of taking other results from the done queue and putting them back.
+    """
+    def __init__(self, pre_q: Queue, done_q: Queue):
+        """
+        :param pre_q: The queue on which new work is placed, i.e. the input of the first stage.
+        :param done_q: The queue on which the last stage places finished work.
+        """
+        self.pre_q = pre_q
+        self.done_q = done_q
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._dispatch, name='dispatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, work: Work) -> Future:
+        """
+        :param work: The work to be done, its uuid must be unique among the work in progress.
+        :return: A future that will hold the finished work.
+        """
+        future = Future()
+        with self._lock:
+            assert work.uuid not in self._futures, f"Work with uuid {work.uuid} is already in progress"
+            self._futures[work.uuid] = future
+        self.pre_q.put_nowait(work)
+        return future
+
+    def forget(self, uuid: str):
+        """
+        Stops waiting for work, e.g. after its request timed out. The work is discarded when it finishes.
+        :param uuid: The uuid of the submitted work
+        """
+        with self._lock:
+            self._futures.pop(uuid, None)
+
+    def _dispatch(self):
+        while True:
+            try:
+                work = self.done_q.get()
+            except Exception:
+                logging.exception("Cannot receive finished work, the request waiting for it will time out")
+                continue
+            with self._lock:
+                future = self._futures.pop(work.uuid, None)
+            try:
+                # the document is loaded even if nobody waits for it, to free its shared memory
+                work.unpack()
+                if work.error is not None:
+                    raise WorkError(work.error)
+            except Exception as error:
+                if future is None:
+                    logging.warning(f"Work with unknown uuid {work.uuid} failed: {error}")
+                else:
+                    future.set_exception(error)
+                continue
+            if future is None:
+                logging.warning(f"Received finished work with unknown uuid {work.uuid}, discarding it.")
+                continue
+            future.set_result(work)
+
+
+def create_queues(conf, n_parallel, max_batch_sentences=1, max_batch_wait=0., min_shared_bytes=MIN_SHARED_BYTES,
+                  min_columnar_tokens=MIN_COLUMNAR_TOKENS):
+    """
+    :param conf: The configuration of the pipeline
+    :param n_parallel: The number of parallel workers for the steps before and after BERT.
+    :param max_batch_sentences: See :func:`bert_batch_target_wrapper`. Batching is disabled if this is 1 or less.
+    :param max_batch_wait: See :func:`bert_batch_target_wrapper`
+    :param min_shared_bytes: See :class:`DocumentHandle`
+    :param min_columnar_tokens: See :meth:`Work.pack`
+    :return: The queues that connect the workers.
+    """
+    # all workers register their shared memory with the same tracker, which unlinks what is left when the server stops
+    resource_tracker.ensure_running()
     pre_q = Queue()
     bert_q = Queue()
     post_q = Queue()
@@ -45,9 +304,18 @@ def create_queues(conf, n_parallel):
         for queue, steps in all_steps.items()
     }
 
-    Process(target=target_wrapper, args=(bert_q, post_q, confs['bert'], 0), daemon=True).start()
+    if 'ner_bert' in confs['bert'] and max_batch_sentences > 1:
+        Process(target=bert_batch_target_wrapper,
+                args=(bert_q, post_q, confs['bert'], 0, max_batch_sentences, max_batch_wait, min_shared_bytes,
+                      min_columnar_tokens),
+                daemon=True).start()
+    else:
+        Process(target=target_wrapper, args=(bert_q, post_q, confs['bert'], 0, min_shared_bytes, min_columnar_tokens),
+                daemon=True).start()
     for nr in range(n_parallel):
         # reader_proc() reads from pqueue as a separate process
-        Process(target=target_wrapper, args=(pre_q, bert_q, confs['pre'], nr), daemon=True).start()
-        Process(target=target_wrapper, args=(post_q, done_q, confs['post'], nr), daemon=True).start()
+        Process(target=target_wrapper, args=(pre_q, bert_q, confs['pre'], nr, min_shared_bytes, min_columnar_tokens),
+                daemon=True).start()
+        Process(target=target_wrapper, args=(post_q, done_q, confs['post'], nr, min_shared_bytes, min_columnar_tokens),
+                daemon=True).start()
     return pre_q, bert_q, post_q, done_q
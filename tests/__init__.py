@@ -0,0 +1,4 @@
+from lib import constants
+
+# the tests do not keep compiled data, e.g. of the ner_lists, see TestListIndex for the tests of the cache
+constants.CACHE_DIR = None
@@ -0,0 +1,75 @@
+import pickle
+import unittest
+
+from lib.document import Document, Word, from_buffer, from_json, to_buffer, to_json
+from server.parallel_support import DocumentHandle, Work
+
+
+class TestWord(unittest.TestCase):
+    def test_mapping(self):
+        word = Word('Weerld!', 7, 14)
+        self.assertEqual({'word': 'Weerld!', 'begin_char': 7, 'end_char': 14, 'ner': True}, word)
+        self.assertNotIn('post_correction', word)
+        self.assertIsNone(word.get('post_correction'))
+        word['post_correction'] = 'Wereld!'
+        self.assertEqual('Wereld!', word['post_correction'])
+        del word['post_correction']
+        with self.assertRaises(KeyError):
+            _ = word['post_correction']
+        with self.assertRaises(KeyError):
+            word['breeze'] = 'lovely'
+        copy = word.copy()
+        copy['ner'] = False
+        self.assertTrue(word['ner'])
+
+    def test_json(self):
+        sentences = [[{'word': 'Hallo', 'begin_char': 0, 'end_char': 5, 'ner': True, 'post_correction': 'Hallo'},
+                      {'word': ' ', 'begin_char': 5, 'end_char': 6, 'ner': False, 'post_correction': ' ',
+                       'labels': {'BERT': {}, 'lists': []}}]]
+        document = from_json(sentences)
+        self.assertTrue(all(isinstance(w, Word) for s in document for w in s))
+        self.assertEqual(sentences, document)
+        self.assertEqual(sentences, to_json(document))
+        self.assertTrue(all(type(w) is dict for s in to_json(document) for w in s))
+        unpickled = pickle.loads(pickle.dumps(document))
+        self.assertIsInstance(unpickled, Document)
+        self.assertTrue(all(isinstance(w, Word) for s in unpickled for w in s))
+        self.assertEqual(sentences, unpickled)
+        self.assertEqual(document[0][0], pickle.loads(pickle.dumps(document[0][0])))
+
+    def test_buffer(self):
+        chars = [[0, 5], [5, 6]]
+        sentences = [[{'word': 'Hallo', 'begin_char': 0, 'end_char': 5, 'ner': True, 'bio': 'B-person',
+                       'entity_chars': chars},
+                      {'word': ' ', 'begin_char': 5, 'end_char': 6, 'ner': False, 'bio': 'I-person',
+                       'entity_chars': chars, 'labels': {'BERT': {}, 'lists': []}}],
+                     [],
+                     [{'word': 'wéreld\ud800', 'begin_char': None, 'end_char': None, 'ner': True,
+                       'modernisation': 1.5}]]
+        document = from_buffer(to_buffer(from_json(sentences)))
+        self.assertIsInstance(document, Document)
+        self.assertEqual(sentences, document)
+        # the words of an entity still share their chars
+        self.assertIs(document[0][0]['entity_chars'], document[0][1]['entity_chars'])
+        self.assertEqual([], from_buffer(to_buffer([])))
+
+    def test_document_handle(self):
+        document = from_json([[{'word': 'Hallo', 'begin_char': 0, 'end_char': 5, 'ner': True}]])
+        for min_shared_bytes in (None, 0):
+            handle = pickle.loads(pickle.dumps(DocumentHandle(document, min_shared_bytes)))
+            self.assertEqual(min_shared_bytes is None, handle.name is None)
+            self.assertEqual(1, len(handle))
+            self.assertEqual(document, handle.load())
+
+    def test_pack(self):
+        document = from_json([[{'word': 'Hallo', 'begin_char': 0, 'end_char': 5, 'ner': True}]])
+        # a small document is pickled as it is
+        work = Work('small', document)
+        work.pack()
+        self.assertIs(document, work.data)
+        work.pack(min_columnar_tokens=None)
+        self.assertIs(document, work.data)
+        work.pack(min_columnar_tokens=1)
+        self.assertIsInstance(work.data, DocumentHandle)
+        work.unpack()
+        self.assertEqual(document, work.data)
@@ -1,10 +1,22 @@
 import os.path as op
+import unittest
+import numpy as np
 
+from data_suppliers.text.nerbio.data_classes import InputData
+from models.nlp.mocks.mock_tokenizer import MockTokenizer
 from lib.ner_bert import ner_bert
+from lib.string_to_sentences.string_to_sentences import StringToSentences
 from lib import constants
 
 from tests import test_tools
 
+try:
+    import tensorflow as tf
+    from models.nlp.bert_home_trained.model import INPUT_NAMES, BertTF, max_prediction_difference, \
+        variable_length_model
+except ImportError:
+    BertTF = None
+
 
 class TestNerBert(test_tools.TestTools):
     @classmethod
@@ -26,6 +38,150 @@ class TestNerBert(test_tools.TestTools):
         self.compare_output()
 
 
+class TestCallBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        constants.DATA_DIR = test_tools.TEST_DATA_DIR
+        cls.ner_bert = ner_bert.MultipleBerts(
+            berts_to_use={'mock': ['person', 'location', 'time']},
+        )
+        string_to_sentences = StringToSentences()
+        cls.documents = [string_to_sentences('Hallo Wereld!\n\nVoor mij Adriaen van Renteregem'),
+                         string_to_sentences('geboren te Eindhoven. Tweede zin.')]
+
+    def test_call_batch(self):
+        # batching documents gives the same labels as running the concatenated sentences
+        batched = self.ner_bert.call_batch([[[w.copy() for w in s] for s in d] for d in self.documents])
+        concatenated = self.ner_bert([[w.copy() for w in s] for d in self.documents for s in d])
+        self.assertEqual(len(batched), len(self.documents))
+        batched_words = [w for d in batched for s in d for w in s]
+        concatenated_words = [w for s in concatenated for w in s]
+        self.assertEqual(len(batched_words), len(concatenated_words))
+        for batched_word, word in zip(batched_words, concatenated_words):
+            self.assertEqual(batched_word.get('labels'), word.get('labels'))
+            self.assertEqual(batched_word.get('bio'), word.get('bio'))
+        # but entities do not run across documents
+        for document in batched:
+            document_chars = [[w['begin_char'], w['end_char']] for s in document for w in s]
+            for word in (w for s in document for w in s if 'entity_chars' in w):
+                self.assertTrue(all(chars in document_chars for chars in word['entity_chars']))
+
+
+class TestPackSentences(unittest.TestCase):
+    vocab = ner_bert.BERTS['mock']['vocab']
+    sentences = [['hallo', 'wereld'], ['voor', 'mij', 'adriaen', 'van', 'renteregem'], ['geboren'], ['te', 'eindhoven']]
+
+    @classmethod
+    def token_labels(cls, ids: np.ndarray):
+        # labels that depend on the token only, not on its position, so packing should not change the result
+        return np.eye(len(cls.vocab))[ids % len(cls.vocab)]
+
+    def test_pack_sentences(self):
+        tokenizer = MockTokenizer()
+        unpacked = InputData.from_sentences(self.sentences, tokenizer, 32, self.vocab)
+        packed = InputData.from_sentences(self.sentences, tokenizer, 32, self.vocab, pack_sentences=True)
+        self.assertEqual(unpacked.size, len(self.sentences))
+        self.assertEqual(packed.size, 3)
+        # the last row contains [CLS] geboren [SEP] te eindhoven [SEP]
+        self.assertEqual(packed.ids[2].tolist().count(tokenizer.ids['[CLS]']), 1)
+        self.assertEqual(packed.ids[2].tolist().count(tokenizer.ids['[SEP]']), 2)
+        # padding is masked
+        for row, masks in zip(packed.sentence_data, packed.masks):
+            self.assertFalse(masks[len(row.ids):].any())
+        self.assertEqual(
+            unpacked.inverse_apply_labels(self.token_labels(unpacked.ids), trim_ends=True),
+            packed.inverse_apply_labels(self.token_labels(packed.ids), trim_ends=True)
+        )
+
+    def test_length_buckets(self):
+        class DynamicLengthBert:
+            dynamic_length = True
+            batch_size = 2
+            max_length = 32
+
+            def __call__(self, x):
+                assert x[0].shape[0] * x[0].shape[1] <= self.batch_size * self.max_length
+                return TestPackSentences.token_labels(x[0])
+
+        input_data = InputData.from_sentences(self.sentences, MockTokenizer(), 32, self.vocab)
+        buckets = input_data.length_buckets(64)
+        self.assertEqual(sorted(row for rows, _ in buckets for row in rows), list(range(len(self.sentences))))
+        for rows, length in buckets:
+            self.assertEqual(length, input_data.lengths[rows].max())
+            self.assertTrue(len(rows) == 1 or len(rows) * length <= 64)
+        bert = ner_bert.MultipleBerts(berts_to_use={})
+        self.assertEqual(
+            input_data.inverse_apply_labels(self.token_labels(input_data.ids), trim_ends=True),
+            input_data.inverse_apply_labels(bert._predict(DynamicLengthBert(), input_data), trim_ends=True)
+        )
+
+
+class TestSlidingWindows(unittest.TestCase):
+    vocab = TestPackSentences.vocab
+    sentences = TestPackSentences.sentences
+    token_labels = TestPackSentences.token_labels
+
+    def test_sliding_windows(self):
+        tokenizer = MockTokenizer()
+        sentence = [word for sentence in self.sentences for word in sentence] * 3
+        unwindowed = InputData.from_sentences([sentence], tokenizer, 256, self.vocab)
+        windowed = InputData.from_sentences([sentence], tokenizer, 32, self.vocab, window_overlap=12)
+        self.assertGreater(windowed.size, 1)
+        self.assertEqual(len(windowed.sentences), 1)
+        for trim_ends in (True, False):
+            self.assertEqual(
+                unwindowed.inverse_apply_labels(self.token_labels(unwindowed.ids), trim_ends=trim_ends),
+                windowed.inverse_apply_labels(self.token_labels(windowed.ids), trim_ends=trim_ends)
+            )
+        # windows can be packed too
+        packed = InputData.from_sentences(self.sentences + [sentence], tokenizer, 32, self.vocab,
+                                          pack_sentences=True, window_overlap=12)
+        self.assertEqual(
+            unwindowed.inverse_apply_labels(self.token_labels(unwindowed.ids), trim_ends=True)[0],
+            packed.inverse_apply_labels(self.token_labels(packed.ids), trim_ends=True)[-1]
+        )
+
+
+@unittest.skipIf(BertTF is None, 'the dependencies of the TensorFlow BERT are not installed')
+class TestBertTF(unittest.TestCase):
+    @staticmethod
+    def toy_model(length):
+        # each token sees the masked mean of the sentence, like the attention of a BERT
+        inputs = [tf.keras.Input(shape=(length,), dtype=tf.int32, name=name) for name in INPUT_NAMES]
+        embedded = tf.keras.layers.Embedding(128, 8)(inputs[0])
+        mask = tf.keras.layers.Lambda(lambda m: tf.cast(m, tf.float32)[..., None])(inputs[1])
+        context = tf.keras.layers.Lambda(
+            lambda e: tf.reduce_sum(e[0] * e[1], axis=1, keepdims=True) / tf.reduce_sum(e[1], axis=1, keepdims=True)
+        )([embedded, mask])
+        outputs = tf.keras.layers.Dense(8, activation='softmax')(tf.keras.layers.Add()([embedded, context]))
+        return tf.keras.Model(inputs, outputs)
+
+    def test_dynamic_length(self):
+        self.assertFalse(BertTF.has_dynamic_length(self.toy_model(32)))
+        model = self.toy_model(None)
+        self.assertTrue(BertTF.has_dynamic_length(model))
+        lengths = np.array([5, 9, 3])
+        masks = (np.arange(32) < lengths[:, None]).astype(np.int32)
+        ids = np.random.default_rng(0).integers(1, 128, size=masks.shape, dtype=np.int32) * masks
+        x = [ids, masks, np.zeros_like(ids), masks]
+        predict = BertTF.predict_function(model)
+        padded = predict(*[tf.constant(inputs) for inputs in x]).numpy()
+        dynamic = predict(*[tf.constant(inputs[:, :lengths.max()]) for inputs in x]).numpy()
+        np.testing.assert_allclose(padded[:, :lengths.max()], dynamic, rtol=1e-5, atol=1e-6)
+        # a fixed length model only accepts its own length
+        fixed = BertTF.predict_function(self.toy_model(32), 32)
+        with self.assertRaises(TypeError):
+            fixed(*[tf.constant(inputs[:, :lengths.max()]) for inputs in x])
+
+    def test_variable_length_model(self):
+        fixed = self.toy_model(32)
+        model = variable_length_model(fixed)
+        self.assertTrue(BertTF.has_dynamic_length(model))
+        # the layers, and so the weights, are shared
+        self.assertIs(fixed.layers[-1], model.layers[-1])
+        self.assertLess(max_prediction_difference(fixed, model, 9), 1e-5)
+
+
 if __name__ == "__main__":
     TestNerBert.setUpClass()
     tnl = TestNerBert(method_name='test_add_entity_be_chars')
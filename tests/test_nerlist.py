@@ -1,6 +1,24 @@
+import copy
+import itertools
+import os
 import os.path as op
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from difflib import SequenceMatcher
+from heapq import nlargest
 
 from lib.ner_lists import ner_lists
+from lib.ner_lists.aho_corasick import TokenAutomaton
+from lib.ner_lists.batch_scorer import BatchScorer
+from lib.ner_lists.direct_finder import DirectFinder
+from lib.ner_lists.entity import Entity
+from lib.ner_lists.finder import Finder, FindEntities
+from lib.ner_lists.fuzzy_matcher import FuzzyTreeMatcher, FuzzyListMatcher, LengthBuckets
+from lib.ner_lists.fuzzy_permutative_finder import create_tree, create_permutations, remove_overlap
+from lib.ner_lists.registry import REGISTRY
 from lib import constants
 
 from tests import test_tools
@@ -37,6 +55,219 @@ class TestNerLists(test_tools.TestTools):
         self.assertEqual(out[2]['labels']['lists'][0]['bio'], 'I')
 
 
+class TestFuzzyMatcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        lists = Finder.create_lists(
+            op.join(test_tools.TEST_DATA_DIR, 'ner_lists', 'SZSA', 'fuzzy_permutative', 'location'))
+        cls.matchers = [FuzzyTreeMatcher(create_tree(searchables), 0.85) for searchables in lists.values()]
+
+    def test_score_key(self):
+        # scoring against the keys selected by the trigram index gives the same best key as scoring all keys
+        random.seed(0)
+        for matcher in self.matchers:
+            keys = list(matcher.tree.keys())
+            words = keys + ['Amsterdam', 'batavia', 'de', 'x', '']
+            for key in keys:
+                i = random.randrange(len(key))
+                words += [key[:i] + 'e' + key[i + 1:], key[:i] + key[i + 1:], key.upper(), key[::-1]]
+            for word in words:
+                for cutoff in (0.425, 0.6, 0.85):
+                    self.assertEqual(matcher.score([word], keys, cutoff), matcher.score_key(word, cutoff))
+
+    def test_batch_scorer(self):
+        # the batch scorer gives the same matches as SequenceMatcher, also for words too long for the LCS bound
+        random.seed(0)
+        keys = list(self.matchers[0].tree.keys())
+        scorer = BatchScorer(keys)
+        words = ['', 'x', 'amsterdam', 'batavia' * 10] + [random.choice(keys) + random.choice(keys) for _ in range(50)]
+        for word in words:
+            for cutoff in (0., 0.425, 0.85):
+                self.assertEqual(FuzzyTreeMatcher.get_close_matches_scores(word, keys, 3, cutoff),
+                                 scorer.get_close_matches_scores(word, 3, cutoff))
+
+    def test_best_matches(self):
+        # pruning with the best scores so far gives the k best matches of scoring all keys
+        random.seed(0)
+        matcher = self.matchers[0]
+        keys = list(matcher.tree.keys())
+        for word in ['', 'amsterdam', 'kerkstraat'] + random.sample(keys, min(len(keys), 20)):
+            for k in (1, 5):
+                for cutoff in (0.425, 0.85):
+                    ratios = [(SequenceMatcher(None, key, word).ratio(), key) for key in keys]
+                    expected = nlargest(k, [ratio for ratio in ratios if ratio[0] >= cutoff])
+                    self.assertEqual(expected, matcher.get_close_matches_scores(word, keys, k, cutoff))
+                    self.assertEqual(expected, matcher.key_scorer.get_close_matches_scores(word, k, cutoff))
+                    self.assertEqual([matcher.score([word], [key], cutoff) for _, key in expected],
+                                     matcher.best_matches([word], keys, k, cutoff))
+
+    def test_create_permutations(self):
+        self.assertEqual(['fortbatavia', 'bataviafort'], create_permutations(('fort', 'batavia')))
+        # repeated words give the same ordering only once
+        self.assertEqual(['dedamde', 'dededam', 'damdede'], create_permutations(('de', 'dam', 'de')))
+        # the number of orderings is capped, the given order comes first
+        self.assertEqual(['abcd', 'abdc', 'acbd'], create_permutations(('a', 'b', 'c', 'd'), max_permutations=3))
+        for matcher in self.matchers:
+            for searchables in matcher.tree.values():
+                for searchable, entry in searchables.items():
+                    self.assertEqual(''.join(searchable), entry['permutations'][0])
+
+    def test_token_automaton(self):
+        # the automaton finds the same (overlapping) occurrences as comparing all slices of the sentence
+        sequences = [('van', 'der', 'berg'), ('der', 'berg'), ('berg',), ('van', 'der'), ('der', 'van', 'der', 'x')]
+        automaton = TokenAutomaton(sequences)
+        sentence = 'jan van der van der berg en der van der x berg'.split()
+        expected = sorted((begin, begin + len(sequence), sequence) for sequence in sequences
+                          for begin in range(len(sentence)) if tuple(sentence[begin:begin + len(sequence)]) == sequence)
+        self.assertEqual(expected, sorted(automaton.find(sentence)))
+
+    def test_first_word_index(self):
+        searchables = [('nieuwe', 'amstelstraat'), ('n', 'amstelstraat'), ('nieuwe', 'kerk')]
+        matcher = FuzzyListMatcher({
+            searchable: [{'searchable': searchable, 'canonical_form': '', 'extra_attributes': {}}]
+            for searchable in searchables
+        }, 0.85)
+        self.assertEqual([0, 2], matcher.first_word_index['nieuwe'])
+        # only the searchables starting with a word that matches the first word are scored
+        for sentence, searchable in [(['de', 'nieuwe', 'amstelstraat'], 'nieuwe amstelstraat'),
+                                     (['de', 'n', 'amstelstraat'], 'n amstelstraat')]:
+            entities = list(matcher.find_matches(0, sentence))
+            self.assertEqual([(1, 3, searchable)], [(entity.begin, entity.end, entity.searchable) for entity in entities])
+
+    def test_remove_overlap(self):
+        def entity(begin, end, score):
+            return Entity(sentence=0, begin=begin, end=end, score=score, searchable='', canonical_form='',
+                          extra_attributes={})
+
+        # two short entities together score higher than the long one they overlap with, the greedy selection replaces
+        # the first one by the long one and keeps it
+        entities = [entity(0, 1, 0.9), entity(0, 3, 1.), entity(1, 3, 0.95)]
+        self.assertEqual([entities[0], entities[2]], remove_overlap(entities, 3))
+        self.assertEqual([entities[1]], remove_overlap(entities, 3, 'greedy'))
+        with self.assertRaises(ValueError):
+            remove_overlap(entities, 3, 'best')
+
+        # the selection has the highest total score of all sets of non-overlapping entities
+        random.seed(0)
+        for _ in range(200):
+            entities = []
+            for _ in range(random.randint(0, 8)):
+                begin = random.randrange(10)
+                entities.append(entity(begin, begin + random.randint(1, 3), random.choice([0.86, 0.9, 0.95, 1.])))
+            best = max(sum(e.score for e in subset) for n in range(len(entities) + 1)
+                       for subset in itertools.combinations(entities, n)
+                       if all(a.end <= b.begin or b.end <= a.begin for a, b in itertools.combinations(subset, 2)))
+            kept = remove_overlap(entities, 12)
+            self.assertAlmostEqual(best, sum(e.score for e in kept))
+            self.assertTrue(all(a.end <= b.begin or b.end <= a.begin for a, b in itertools.combinations(kept, 2)))
+
+    def test_length_range(self):
+        # the length range contains exactly the lengths that pass real_quick_ratio
+        for length in range(30):
+            for cutoff in (0., 0.425, 0.46, 0.85, 0.92, 1.):
+                low, high = LengthBuckets.length_range(length, cutoff)
+                for other_length in range(100):
+                    s = SequenceMatcher(None, 'a' * length, 'b' * other_length)
+                    self.assertEqual(s.real_quick_ratio() >= cutoff,
+                                     low <= other_length and (high is None or other_length <= high))
+
+
+class SortedList(FindEntities):
+    def __init__(self, searchables, cutoff_score):
+        self.searchables = sorted(searchables)
+        self.cutoff_score = cutoff_score
+        super().__init__()
+
+    def __call__(self, i_sentence, sentence):
+        return []
+
+    def __eq__(self, other):
+        return (self.searchables, self.cutoff_score) == (other.searchables, other.cutoff_score)
+
+    def with_parameters(self, cutoff_score):
+        other = copy.copy(self)
+        other.cutoff_score = cutoff_score
+        return other
+
+
+class CountingFinder(Finder):
+    nr_builds = 0
+
+    @classmethod
+    def build_entity_finder(cls, searchables, cutoff_score):
+        cls.nr_builds += 1
+        return SortedList(searchables, cutoff_score)
+
+
+class TestListIndex(unittest.TestCase):
+    def setUp(self):
+        self.dirpaths = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        for dirpath in self.dirpaths:
+            shutil.copy(op.join(test_tools.TEST_DATA_DIR, 'ner_lists', 'SZSA', 'direct', 'person',
+                                'voc_opvarenden.txt'), dirpath)
+        self.cache_dir = tempfile.mkdtemp()
+        constants.CACHE_DIR = self.cache_dir
+        CountingFinder.nr_builds = 0
+        REGISTRY.clear()
+
+    def tearDown(self):
+        for dirpath in self.dirpaths + [self.cache_dir]:
+            shutil.rmtree(dirpath)
+        constants.CACHE_DIR = None
+        REGISTRY.clear()
+
+    def test_load_index(self):
+        dirpath = self.dirpaths[0]
+        built = CountingFinder.load_index(dirpath, cutoff_score=0.9)
+        self.assertEqual(built, CountingFinder.load_index(dirpath, cutoff_score=0.9))
+        self.assertEqual(1, CountingFinder.nr_builds)
+        # the index is kept in the cache directory, not next to the lists
+        self.assertTrue(CountingFinder.index_path(dirpath).startswith(self.cache_dir))
+        self.assertEqual(['voc_opvarenden.txt'], os.listdir(dirpath))
+        # other parameters or a modified list rebuild the index
+        CountingFinder.load_index(dirpath, cutoff_score=0.8)
+        self.assertEqual(2, CountingFinder.nr_builds)
+        path = op.join(dirpath, 'voc_opvarenden.txt')
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+        self.assertEqual(built['voc_opvarenden'].searchables,
+                         CountingFinder.load_index(dirpath, cutoff_score=0.8)['voc_opvarenden'].searchables)
+        self.assertEqual(3, CountingFinder.nr_builds)
+        # a corrupt index is rebuilt
+        with open(CountingFinder.index_path(dirpath), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertEqual(built['voc_opvarenden'].searchables,
+                         CountingFinder.load_index(dirpath, cutoff_score=0.8)['voc_opvarenden'].searchables)
+        self.assertEqual(4, CountingFinder.nr_builds)
+
+    def test_registry(self):
+        # identical lists in different directories share one compiled finder
+        first = CountingFinder.load_entity_finders(self.dirpaths[0], cutoff_score=0.9)
+        second = CountingFinder.load_entity_finders(self.dirpaths[1], cutoff_score=0.9)
+        self.assertIs(first['voc_opvarenden'], second['voc_opvarenden'])
+        self.assertEqual(1, CountingFinder.nr_builds)
+        # also with other parameters
+        third = CountingFinder.load_entity_finders(self.dirpaths[1], cutoff_score=0.8)
+        self.assertEqual(0.8, third['voc_opvarenden'].cutoff_score)
+        self.assertIs(first['voc_opvarenden'].searchables, third['voc_opvarenden'].searchables)
+        self.assertEqual(1, CountingFinder.nr_builds)
+        report = REGISTRY.report()
+        self.assertEqual(1, len(report))
+        self.assertEqual(self.dirpaths, [op.dirname(path) for path in report[0]['paths']])
+        self.assertGreater(report[0]['resident_size'], sys.getsizeof(first['voc_opvarenden'].searchables))
+
+    def test_direct_registry(self):
+        first = DirectFinder.load_entity_finders(self.dirpaths[0])
+        second = DirectFinder.load_entity_finders(self.dirpaths[1])
+        self.assertIs(first['voc_opvarenden'], second['voc_opvarenden'])
+        self.assertIs(first['voc_opvarenden'], first['voc_opvarenden'].with_parameters())
+        self.assertIs(first['voc_opvarenden'], first['voc_opvarenden'].with_parameters(cutoff_score=0.9))
+        # the finders have to implement how they are built and shared
+        with self.assertRaises(TypeError):
+            Finder('person', {}, 'NER')
+        with self.assertRaises(TypeError):
+            FindEntities()
+
+
 if __name__ == "__main__":
     TestNerLists.setUpClass()
     tnl = TestNerLists(method_name='test_ner_list_small_sample')
@@ -0,0 +1,65 @@
+import queue
+import threading
+import unittest
+
+from lib import constants
+from lib.document import from_json
+from lib.string_to_sentences.string_to_sentences import StringToSentences
+from server import fast_server
+from server.parallel_support import DocumentHandle, Dispatcher, Work, WorkError, bert_batch_target_wrapper, \
+    target_wrapper
+
+from tests import test_tools
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.pre_q, self.done_q = queue.Queue(), queue.Queue()
+        self.dispatcher = Dispatcher(self.pre_q, self.done_q)
+
+    def test_failed_work(self):
+        threading.Thread(target=target_wrapper, args=(self.pre_q, self.done_q, {'string_to_sentences': {}}, 0),
+                         daemon=True).start()
+        failed = self.dispatcher.submit(Work('failed', 42, steps=['string_to_sentences']))
+        finished = self.dispatcher.submit(Work('finished', 'Hallo Wereld!', steps=['string_to_sentences']))
+        with self.assertRaises(WorkError):
+            failed.result(timeout=60)
+        # the worker survives the failure
+        self.assertEqual('Hallo', finished.result(timeout=60).data[0][0]['word'])
+
+    def test_failed_bert_batch(self):
+        constants.DATA_DIR = test_tools.TEST_DATA_DIR
+        conf = {'ner_bert': {'berts_to_use': {'mock': ['person', 'location', 'time']}}}
+        malformed = self.dispatcher.submit(Work('malformed', [[{'word': 'Hallo'}]], steps=['ner_bert']))
+        finished = self.dispatcher.submit(Work('finished', StringToSentences()('Hallo Wereld!'), steps=['ner_bert']))
+        # both requests are in the queue before the worker starts, so they are in the same batch
+        threading.Thread(target=bert_batch_target_wrapper, args=(self.pre_q, self.done_q, conf, 0, 256, 1.),
+                         daemon=True).start()
+        with self.assertRaises(WorkError):
+            malformed.result(timeout=60)
+        self.assertIn('bio', finished.result(timeout=60).data[0][0])
+
+    def test_failed_unpack(self):
+        work = Work('corrupt', None)
+        work.data = DocumentHandle(from_json([[{'word': 'Hallo', 'begin_char': 0, 'end_char': 5, 'ner': True}]]), None)
+        work.data.buffer = b'corrupt'
+        future = self.dispatcher.submit(work)
+        self.done_q.put(self.pre_q.get())
+        with self.assertRaises(Exception):
+            future.result(timeout=60)
+        # the dispatcher survives the failure
+        future = self.dispatcher.submit(Work('finished', 'Hallo'))
+        self.done_q.put(self.pre_q.get())
+        self.assertEqual('Hallo', future.result(timeout=60).data)
+
+
+class TestTimeout(unittest.TestCase):
+    def test_timeout(self):
+        pre_q, done_q = queue.Queue(), queue.Queue()
+        # no workers, so the work never finishes
+        fast_server.dispatcher = Dispatcher(pre_q, done_q)
+        fast_server.app.config['REQUEST_TIMEOUT'] = 0.1
+        response = fast_server.app.test_client().post('/pipeline', json={'input_data': 'Hallo'})
+        self.assertEqual(504, response.status_code)
+        self.assertIsNone(response.json['results'])
+        self.assertEqual({}, fast_server.dispatcher._futures)
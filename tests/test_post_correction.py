@@ -1,6 +1,12 @@
+import os
+import os.path as op
+import tempfile
 import unittest
 
-from lib.post_correction import post_correction
+from lib.post_correction import post_correction, spellchecker_local
+from lib.post_correction.freq_table_clean_up import TABLES, FreqTableCleanUp
+from lib.post_correction.lru_cache import LRUCache
+from lib.post_correction.mapped_table import MappedTable, write_table
 from lib.string_to_sentences import string_to_sentences
 from lib import schema
 from lib import constants
@@ -37,6 +43,80 @@ class TestPostCorrection(unittest.TestCase):
         validator = schema.Validator(ignore=('modernisation', 'ner_bert', 'ner_lists'))
         validator(res_sentences)
 
+    def testUniqueWords(self):
+        text = 'De ziinde van de ziijnde en de zinde. De ziijnde van de zinde.'
+        pc = post_correction.PostCorrection()
+        sentences = pc(string_to_sentences.StringToSentences()(text))
+        self.assertEqual([pc.freq_table_clean_up(w['word']) for s in sentences for w in s],
+                         [w['post_correction'] for s in sentences for w in s])
+
+    def testSymmetricDelete(self):
+        text = 'Dit woord is A:o 2020 fout: vergaene, vergeane en vergane. Tweede zin met ziinde, ziijnde en zinde.'
+        norvig = post_correction.PostCorrection()(string_to_sentences.StringToSentences()(text))
+        symmetric_delete = post_correction.PostCorrection(engine='symmetric_delete')(
+            string_to_sentences.StringToSentences()(text))
+        self.assertEqual([w['post_correction'] for s in norvig for w in s],
+                         [w['post_correction'] for s in symmetric_delete for w in s])
+
+    def testCache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = op.join(tmp_dir, 'cache.json')
+            clean_up = FreqTableCleanUp('post_correction', cache_size=2, cache_path=cache_path)
+            for word in ('vergaene', 'ziijnde', 'vergaene', 'zinde', 'ziijnde', 'kort', 'Ziijnde'):
+                self.assertEqual(clean_up.spell.correction(word) if len(word) > 4 and word.islower() else word,
+                                 clean_up(word))
+            info = clean_up.cache.info()
+            # short and capitalized words are not corrected, so not cached
+            self.assertEqual((1, 4, 2, 2), (info['hits'], info['misses'], info['evictions'], info['size']))
+            self.assertNotIn('vergaene', clean_up.cache.values)
+            clean_up.save_cache()
+
+            restarted = FreqTableCleanUp('post_correction', cache_size=1, cache_path=cache_path)
+            self.assertEqual(1, len(restarted.cache.values))
+            self.assertEqual(clean_up('ziijnde'), restarted('ziijnde'))
+            self.assertEqual(1, restarted.cache.info()['hits'])
+
+    def testCacheFile(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = op.join(tmp_dir, 'cache.json')
+            first = LRUCache(str.upper, 3)
+            second = LRUCache(str.title, 3)
+            first('aap'), first('noot')
+            second('noot'), second('mies')
+            # the workers share the file, their entries are merged
+            first.save(cache_path, 'v1')
+            second.save(cache_path, 'v1')
+
+            def fail(key):
+                raise AssertionError(f'{key} is recomputed')
+            loaded = LRUCache(fail, 3)
+            self.assertEqual(3, loaded.load(cache_path, 'v1'))
+            self.assertEqual(['AAP', 'Noot', 'Mies'], [loaded(key) for key in ('aap', 'noot', 'mies')])
+            # the lock leaves no files behind
+            self.assertEqual(['cache.json'], os.listdir(tmp_dir))
+            # the values are not valid for another version of the function
+            self.assertEqual(0, LRUCache(fail, 3).load(cache_path, 'v2'))
+
+    def testMappedTable(self):
+        table = TABLES['post_correction']
+        local_dict_path = op.join(constants.DATA_DIR, 'post_correction', table['file'])
+        spell = spellchecker_local.SpellChecker(distance=1, case_sensitive=False, local_dictionary=local_dict_path)
+        spell.word_frequency.remove_by_threshold(threshold=table['threshold'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = op.join(tmp_dir, table['mapped_file'])
+            write_table(path, spell.word_frequency.dictionary, spell._start_set, spell._end_set, spell._start_length,
+                        table['threshold'])
+            mapped_table = MappedTable(path)
+            mapped_spell = spellchecker_local.SpellChecker(distance=1, case_sensitive=False, table=mapped_table)
+            self.assertEqual(dict(spell.word_frequency.dictionary), dict(mapped_spell.word_frequency.dictionary))
+            self.assertEqual(set(spell._start_set), set(mapped_spell._start_set))
+            self.assertEqual(set(spell._end_set), set(mapped_spell._end_set))
+            self.assertEqual(spell.word_frequency.total_words, mapped_spell.word_frequency.total_words)
+            self.assertEqual(0, mapped_spell['onbekend'])
+            for word in ('vergaene', 'vergeane', 'ziijnde', 'zinde', 'Tweede', '2020'):
+                self.assertEqual(spell.correction(word), mapped_spell.correction(word))
+            del mapped_spell, mapped_table  # release the memory map before the file is removed
+
 
 if __name__ == "__main__":
     TestPostCorrection.setUpClass()
@@ -2,8 +2,13 @@
 Module to test the "ners" module
 """
 
+import io
+import re
 import unittest
 
+from lib.document import Word
+from lib.string_to_sentences.replacer import Replacer
+from lib.string_to_sentences.sequence_automaton import PatternClassifier, SequenceAutomaton
 from lib.string_to_sentences.string_to_sentences import StringToSentences
 
 
@@ -27,7 +32,7 @@ class TestCall(unittest.TestCase):
         # Then
         self.assertTrue(isinstance(result, list))
         self.assertTrue(all([isinstance(s, list) and len(s) > 0 for s in result]))
-        self.assertTrue(all([isinstance(w, dict) for s in result for w in s]))
+        self.assertTrue(all([isinstance(w, Word) for s in result for w in s]))
         self.assertTrue(all([all([x in w.keys() for x in essential_keys]) for s in result for w in s]))
 
     def test_empty(self):
@@ -88,3 +93,82 @@ class TestCall(unittest.TestCase):
             self.assertGreater(n, 0)
             self.assertFalse(all(base[begin:end]))
             base[begin:end] = [True]*n
+
+    def test_line_word_split(self):
+        """
+        Words split by a line break are joined, and the sentences keep the offsets of the words.
+        """
+        # Given
+        string_to_sentences = StringToSentences()
+        text = "ook is aan \n„bod gekomen. Daer\nna"
+        expected_result = [
+            [('ook', 0, 3), (' ', 3, 4), ('is', 4, 6), (' ', 6, 7), ('aan \n„bod', 7, 16), (' ', 16, 17),
+             ('gekomen', 17, 24), ('.', 24, 25), (' ', 25, 26)],
+            [('Daer', 26, 30), ('\n', 30, 31), ('na', 31, 33)]
+        ]
+
+        # When
+        result = string_to_sentences(text)
+
+        # Then
+        self.assertEqual([[(w["word"], w["begin_char"], w["end_char"]) for w in s] for s in result], expected_result)
+
+    def test_stream(self):
+        """
+        Streaming a text in small chunks gives the same sentences, also for words and joins across chunks.
+        """
+        # Given
+        string_to_sentences = StringToSentences()
+        text = "ook is aan \n„bod gekomen. Daer\nna\n\nde Chialoup d’ Tal„\n„meije J. Jacobs. Hello world!"
+
+        # When
+        expected = string_to_sentences(text)
+        streamed = [list(string_to_sentences.stream(text, chunk_size)) for chunk_size in (1, 3, 1000)]
+        from_file = list(string_to_sentences.stream(io.StringIO(text), 4))
+
+        # Then
+        self.assertEqual(4, len(expected))
+        for result in streamed + [from_file]:
+            self.assertEqual(expected, result)
+
+
+class TestReplacer(unittest.TestCase):
+    """
+    Test the replacement of word sequences.
+    """
+
+    def test_replace_words(self):
+        # Given
+        replacer = Replacer(from_key='word', to_key='word')
+        words = [{"word": w, "begin_char": i, "end_char": i + 1} for i, w in enumerate("abbab")]
+        patterns = [re.compile("^(.+)$"), re.compile("^(b)$")]
+
+        # When
+        replaced = replacer.replace_words(words, patterns, replacer.joinor())
+
+        # Then
+        self.assertEqual(["ab", "b", "ab"], [w["word"] for w in replaced])
+        self.assertEqual([(0, 2), (2, 3), (3, 5)], [(w["begin_char"], w["end_char"]) for w in replaced])
+        # a new list is returned
+        self.assertEqual("abbab", "".join(w["word"] for w in words))
+
+    def test_sequence_automaton(self):
+        # Given
+        classifier = PatternClassifier()
+        sequences = [["^a$", "^b$"], ["^.$", "^a$", "^(b|c)$"], ["^a$"]]
+        automaton = SequenceAutomaton(sequences, classifier)
+        words = list("abacabb")
+
+        # When
+        starts = automaton.find(words)
+
+        # Then
+        expected = [[i for i in range(len(words) - len(sequence) + 1)
+                     if all(re.search(p, w) for p, w in zip(sequence, words[i:]))] for sequence in sequences]
+        self.assertEqual([[0, 4], [1, 3], [0, 2, 4]], expected)
+        self.assertEqual(expected, starts)
+        self.assertTrue(automaton.matches_at(["c", "a", "b"], sequence=1))
+        self.assertFalse(automaton.matches_at(["c", "b", "b"], sequence=1))
+        # "^a$" is shared by the sequences and each word form is classified once
+        self.assertEqual(4, len(classifier.regexes))
+        self.assertEqual({"a", "b", "c"}, set(classifier.cache))